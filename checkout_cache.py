@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Checkout Session Cache for Spark Tracker
+Reuses an open Stripe Checkout session per (email, tier) until it
+expires, and rate-limits new sessions per user to protect the API quota
+Built by SavvyTech Automations
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from entitlements import normalize_email
+from shared_cache import SharedCache
+
+CHECKOUT_SESSION_LIFETIME = 24 * 3600  # Stripe's default expires_at
+EXPIRY_MARGIN = 10 * 60                 # Stop handing out a URL shortly before it dies
+TIERS = ('basic', 'pro')
+
+
+class RateLimiter:
+    """Sliding-window limit of N calls per key per window"""
+
+    def __init__(self, limit: int = 5, window: float = 60.0, max_keys: int = 10_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._calls: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a slot; returns 0 if allowed, else seconds until the next slot frees up"""
+        now = time.monotonic()
+        with self._lock:
+            calls = self._calls.setdefault(key, deque())
+            self._calls.move_to_end(key)
+            while calls and calls[0] <= now - self.window:
+                calls.popleft()
+            if len(calls) >= self.limit:
+                return calls[0] + self.window - now
+            calls.append(now)
+            while len(self._calls) > self.max_keys:
+                self._calls.popitem(last=False)
+            return 0.0
+
+
+class CheckoutSessionCache:
+    """Front for SparkPaymentProcessor.create_checkout_session"""
+
+    def __init__(self, processor, cache: Optional[SharedCache] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.processor = processor
+        self.cache = cache or SharedCache(max_entries=10_000, default_ttl=CHECKOUT_SESSION_LIFETIME)
+        self.limiter = limiter or RateLimiter()
+
+    def get_checkout(self, customer_email: str, tier: str = "pro") -> Dict:
+        """
+        Checkout URL for a user and tier, reusing an open session when possible
+
+        Args:
+            customer_email: User's email address
+            tier: "basic" or "pro"
+
+        Returns:
+            Dict like create_checkout_session's, plus 'cached' (or 'retry_after' when rate limited)
+        """
+        email = normalize_email(customer_email)
+        key = ('checkout', email, tier)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+        retry_after = self.limiter.acquire(email)
+        if retry_after > 0:
+            return {
+                'success': False,
+                'error': f"Too many checkout attempts, try again in {int(retry_after) + 1}s",
+                'retry_after': retry_after
+            }
+
+        result = self.processor.create_checkout_session(customer_email=email, tier=tier)
+        if result['success']:
+            expires_at = result.get('expires_at') or time.time() + CHECKOUT_SESSION_LIFETIME
+            ttl = expires_at - time.time() - EXPIRY_MARGIN
+            if ttl > 0:
+                self.cache.set(key, result, ttl=ttl)
+        return dict(result, cached=False)
+
+    def invalidate(self, customer_email: str):
+        """Drop a user's open sessions (e.g. after they paid)"""
+        email = normalize_email(customer_email)
+        for tier in TIERS:
+            self.cache.invalidate(('checkout', email, tier))
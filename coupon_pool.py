@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Referral Code Pool for Spark Tracker
+One shared 20%-off coupon; single-use promotion codes on it are minted in
+batches by a background thread and handed out instantly from a local queue.
+Each process mints codes reserved under its own token, so replicas never
+hand out the same code
+Built by SavvyTech Automations
+"""
+
+import logging
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+import stripe
+
+from payment_logging import get_payment_logger, log_event
+
+REFERRAL_COUPON_ID = os.getenv("REFERRAL_COUPON_ID", "spark-referral-20")
+# Set a stable value per replica so a restart takes back its own unassigned codes
+REFERRAL_POOL_TOKEN = os.getenv("REFERRAL_POOL_TOKEN")
+POOL_METADATA = {'pool': 'spark_referral'}
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # No 0/O or 1/I lookalikes
+
+
+def new_code(prefix: str = "SPARK") -> str:
+    return f"{prefix}-" + "".join(secrets.choice(CODE_ALPHABET) for _ in range(8))
+
+
+class ReferralCodePool:
+    """Pre-minted single-use promotion codes, refilled in the background"""
+
+    def __init__(self, coupon_id: str = REFERRAL_COUPON_ID, target: int = 50,
+                 batch_size: int = 20, max_backoff: float = 60.0, token: Optional[str] = REFERRAL_POOL_TOKEN):
+        self.coupon_id = coupon_id
+        # Codes carry reserved_by=token from creation; only this pool may hand them out
+        self.token = token or f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(4)}"
+        self.target = target
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.logger = get_payment_logger()
+
+        self._codes: "queue.Queue[Dict]" = queue.Queue()
+        self._assignments: "queue.Queue[tuple]" = queue.Queue()  # (promotion_code_id, referrer_id)
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        self.last_error = None
+
+    def start(self):
+        """Launch the refill worker (reloads this token's unassigned codes from Stripe first)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="referral-code-pool", daemon=True).start()
+
+    def available(self) -> int:
+        return self._codes.qsize()
+
+    def take(self, referrer_id: str) -> Optional[Dict]:
+        """
+        Hand out a code immediately, without waiting on Stripe
+
+        Args:
+            referrer_id: ID of user who made the referral
+
+        Returns:
+            Dict with 'code' and 'promotion_code_id', or None if the pool is empty
+        """
+        self.start()
+        try:
+            code = self._codes.get_nowait()
+        except queue.Empty:
+            code = None
+        if code is not None:
+            # Tag the code with its referrer off the request path
+            self._assignments.put((code['promotion_code_id'], referrer_id))
+        self._wake.set()  # Worker tags the code and tops the pool back up
+        return code
+
+    def ensure_coupon(self):
+        """Retrieve the shared coupon, creating it on first run"""
+        try:
+            stripe.Coupon.retrieve(self.coupon_id)
+        except stripe.error.InvalidRequestError:
+            stripe.Coupon.create(
+                id=self.coupon_id,
+                percent_off=20,
+                duration='once',
+                name='Spark Tracker Referral',
+                metadata=POOL_METADATA
+            )
+
+    def _promotion_params(self) -> Dict:
+        # API 2025-09-30 moved the coupon under a typed 'promotion' object
+        if (stripe.api_version or "") >= "2025-09-30":
+            return {'promotion': {'type': 'coupon', 'coupon': self.coupon_id}}
+        return {'coupon': self.coupon_id}
+
+    def _metadata(self, **extra) -> Dict:
+        return dict(POOL_METADATA, reserved_by=self.token, **extra)
+
+    def mint_batch(self, count: int) -> Iterator[Dict]:
+        """Create up to count single-use promotion codes on the shared coupon, yielding each as it lands"""
+        for _ in range(count):
+            promo = stripe.PromotionCode.create(
+                code=new_code(),
+                max_redemptions=1,
+                metadata=self._metadata(),  # Reserved atomically with creation
+                **self._promotion_params()
+            )
+            yield {'code': promo.code, 'promotion_code_id': promo.id}
+
+    def mint_for(self, referrer_id: str) -> Dict:
+        """Create one code on the spot, already tagged with its referrer (for when the pool is dry)"""
+        params = dict(code=new_code(), max_redemptions=1,
+                      metadata=self._metadata(referrer_id=referrer_id), **self._promotion_params())
+        try:
+            promo = stripe.PromotionCode.create(**params)
+        except stripe.error.InvalidRequestError:
+            self.ensure_coupon()  # Asked before the refill worker created the shared coupon
+            promo = stripe.PromotionCode.create(**params)
+        return {'code': promo.code, 'promotion_code_id': promo.id}
+
+    def reload(self) -> int:
+        """Queue codes this token reserved but never assigned (e.g. before a restart)"""
+        reloaded = 0
+        for promo in stripe.PromotionCode.list(active=True, limit=100).auto_paging_iter():
+            metadata = promo.metadata.to_dict() if hasattr(promo.metadata, 'to_dict') else dict(promo.metadata or {})
+            # Other replicas' codes, and untagged ones nobody can claim race-free, are left alone
+            if metadata.get('pool') == POOL_METADATA['pool'] and metadata.get('reserved_by') == self.token \
+                    and 'referrer_id' not in metadata and not promo.times_redeemed:
+                self._codes.put({'code': promo.code, 'promotion_code_id': promo.id})
+                reloaded += 1
+        return reloaded
+
+    def _assign_pending(self):
+        while True:
+            try:
+                promotion_code_id, referrer_id = self._assignments.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                stripe.PromotionCode.modify(promotion_code_id, metadata=self._metadata(referrer_id=referrer_id))
+            except stripe.error.StripeError:
+                self._assignments.put((promotion_code_id, referrer_id))  # Retry next round
+                raise
+
+    def _run(self):
+        backoff = 1.0
+        loaded = False
+        while True:
+            self._wake.clear()
+            try:
+                if not loaded:
+                    self.ensure_coupon()
+                    log_event(self.logger, 'referral_pool_reloaded', coupon_id=self.coupon_id, codes=self.reload())
+                    loaded = True
+                self._assign_pending()
+                while self._codes.qsize() < self.target:
+                    start = time.perf_counter()
+                    minted = 0
+                    # Queue each code as it's created, so a failure mid-batch keeps the rest
+                    for code in self.mint_batch(min(self.batch_size, self.target - self._codes.qsize())):
+                        self._codes.put(code)
+                        minted += 1
+                    log_event(self.logger, 'referral_codes_minted', count=minted, available=self._codes.qsize(),
+                              duration_ms=round((time.perf_counter() - start) * 1000, 3))
+                self.last_error = None
+                backoff = 1.0
+                self._wake.wait(timeout=30)  # Also flushes referrer tags periodically
+            except stripe.error.StripeError as e:
+                self.last_error = str(e)
+                log_event(self.logger, 'referral_pool_error', logging.ERROR, error=str(e), retry_in=backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
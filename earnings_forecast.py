@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Earnings Forecast for Spark Tracker
+Holt-Winters exponential smoothing with day-of-week seasonality,
+updated one trip at a time (no refit over full history)
+Built by SavvyTech Automations
+"""
+
+import calendar
+import math
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+
+class EarningsForecaster:
+    """Incremental additive Holt-Winters model over daily net earnings"""
+
+    SEASON_LENGTH = 7   # Day-of-week seasonality
+    BAND_Z = 1.28       # ~80% prediction band
+
+    def __init__(self, alpha: float = 0.3, beta: float = 0.05, gamma: float = 0.2):
+        self.alpha = alpha  # Level smoothing
+        self.beta = beta    # Trend smoothing
+        self.gamma = gamma  # Seasonal smoothing
+
+        self.level: Optional[float] = None
+        self.trend = 0.0
+        self.season = [0.0] * self.SEASON_LENGTH  # Indexed by weekday()
+        self.error_var = 0.0
+        self.days_seen = 0
+
+        # Day currently accumulating trips; closed into the model once a later day shows up
+        self.open_day: Optional[date] = None
+        self.open_total = 0.0
+
+        # Daily actuals for the open week/month only (bounded to ~37 entries)
+        self.actuals: Dict[date, float] = {}
+
+    def add_trip(self, trip_date: date, net: float):
+        """Fold one saved trip into the model"""
+        if self.open_day is None:
+            self.open_day = trip_date
+
+        if trip_date > self.open_day:
+            # Close the open day plus any empty days in between
+            self._observe(self.open_day, self.open_total)
+            day = self.open_day + timedelta(days=1)
+            while day < trip_date:
+                self._observe(day, 0.0)
+                day += timedelta(days=1)
+            self.open_day = trip_date
+            self.open_total = 0.0
+
+        if trip_date == self.open_day:
+            self.open_total += net
+        # Back-dated trips only adjust actuals; closed days don't rewrite model state
+
+        self.actuals[trip_date] = self.actuals.get(trip_date, 0.0) + net
+        self._prune_actuals()
+
+    def _observe(self, day: date, value: float):
+        """One Holt-Winters update step for a completed day"""
+        weekday = day.weekday()
+        seasonal = self.season[weekday]
+
+        if self.level is None:
+            self.level = value - seasonal
+        else:
+            error = value - (self.level + self.trend + seasonal)
+            self.error_var = (1 - self.alpha) * self.error_var + self.alpha * error ** 2
+            previous_level = self.level
+            self.level = self.alpha * (value - seasonal) + (1 - self.alpha) * (self.level + self.trend)
+            self.trend = self.beta * (self.level - previous_level) + (1 - self.beta) * self.trend
+
+        self.season[weekday] = self.gamma * (value - self.level) + (1 - self.gamma) * seasonal
+        self.days_seen += 1
+
+    def _prune_actuals(self):
+        earliest = min(self._week_start(self.open_day), self.open_day.replace(day=1))
+        for day in [d for d in self.actuals if d < earliest]:
+            del self.actuals[day]
+
+    @staticmethod
+    def _week_start(day: date) -> date:
+        return day - timedelta(days=day.weekday())
+
+    def forecast_day(self, day: date) -> float:
+        """Expected net earnings for a future day"""
+        if self.level is None or self.open_day is None:
+            return max(self.open_total, 0.0)
+        horizon = max((day - self.open_day).days, 1)
+        return max(self.level + horizon * self.trend + self.season[day.weekday()], 0.0)
+
+    def forecast_range(self, start: date, end: date, today: Optional[date] = None) -> Dict:
+        """
+        Expected total net for [start, end] given what's been earned so far
+
+        Returns:
+            Dict with expected, low, high and actual-to-date totals
+        """
+        today = today or date.today()
+        actual = sum(v for d, v in self.actuals.items() if start <= d <= today)
+        expected = actual
+        future_days = 0
+
+        day = max(start, today)
+        while day <= end:
+            predicted = self.forecast_day(day)
+            if day == today:
+                # Today is partly earned; only add what the model still expects
+                expected += max(predicted - self.actuals.get(day, 0.0), 0.0)
+            else:
+                expected += predicted
+            future_days += 1
+            day += timedelta(days=1)
+
+        spread = self.BAND_Z * math.sqrt(self.error_var * future_days)
+        return {
+            'expected': expected,
+            'low': max(expected - spread, actual),
+            'high': expected + spread,
+            'actual': actual
+        }
+
+    def week_forecast(self, today: Optional[date] = None) -> Dict:
+        today = today or date.today()
+        start = self._week_start(today)
+        return self.forecast_range(start, start + timedelta(days=6), today)
+
+    def month_forecast(self, today: Optional[date] = None) -> Dict:
+        today = today or date.today()
+        last_day = calendar.monthrange(today.year, today.month)[1]
+        return self.forecast_range(today.replace(day=1), today.replace(day=last_day), today)
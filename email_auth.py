@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Email Sign-In for Spark Tracker
+Passwordless magic links: an HMAC-signed, expiring, single-use token proves
+a driver owns an email before the app grants its tier or loads its stored trips
+Built by SavvyTech Automations
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Dict, Optional
+
+import requests
+
+from stripe_integration import get_setting
+from trip_store import TripRepository
+
+LOGIN_TOKEN_TTL = 15 * 60  # Seconds a magic link stays valid
+_EPHEMERAL_KEY = secrets.token_bytes(32)
+
+
+def secret_key() -> bytes:
+    """App-wide HMAC key (sign-in links, leaderboard aliases)"""
+    # Without APP_SECRET_KEY links only verify on the process that issued them
+    key = get_setting("APP_SECRET_KEY")
+    return key.encode('utf-8') if key else _EPHEMERAL_KEY
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def sign_login_token(email: str, ttl: int = LOGIN_TOKEN_TTL) -> str:
+    """Token binding an email to a one-time nonce and an expiry time"""
+    body = f"{email.strip().lower()}|{secrets.token_hex(16)}|{int(time.time()) + ttl}".encode('utf-8')
+    signature = hmac.new(secret_key(), body, hashlib.sha256).digest()
+    return f"{_b64(body)}.{_b64(signature)}"
+
+
+def verify_login_token(token: str, repository: TripRepository) -> Optional[str]:
+    """
+    The email a token was issued for, burning the token so it can't be replayed
+
+    Args:
+        token: Token from the sign-in link
+        repository: Store that records used nonces
+
+    Returns:
+        The email, or None if forged, malformed, expired or already used
+    """
+    try:
+        body_b64, signature_b64 = token.split('.', 1)
+        body = _unb64(body_b64)
+        signature = _unb64(signature_b64)
+        email, nonce, expires_at = body.decode('utf-8').rsplit('|', 2)
+        expires_at = int(expires_at)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    expected = hmac.new(secret_key(), body, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, expected) or expires_at < time.time():
+        return None
+    if not repository.burn_login_nonce(nonce, expires_at):
+        return None
+    return email
+
+
+def send_login_link(email: str, app_url: str) -> Dict:
+    """
+    Email a magic sign-in link via Mailgun
+
+    Args:
+        email: Address to sign in
+        app_url: Base URL of the app the link opens
+
+    Returns:
+        Dict with success flag (and error message on failure)
+    """
+    api_key = get_setting("MAILGUN_API_KEY")
+    domain = get_setting("MAILGUN_DOMAIN")
+    if not api_key or not domain:
+        return {'success': False, 'error': "Email sign-in isn't configured (MAILGUN_API_KEY / MAILGUN_DOMAIN)"}
+
+    link = f"{app_url.rstrip('/')}/?login={sign_login_token(email)}"
+    try:
+        response = requests.post(
+            f"https://api.mailgun.net/v3/{domain}/messages",
+            auth=("api", api_key),
+            data={
+                'from': f"Spark Tracker <signin@{domain}>",
+                'to': email,
+                'subject': "Your Spark Tracker sign-in link",
+                'text': f"Tap to sign in (valid for {LOGIN_TOKEN_TTL // 60} minutes):\n\n{link}\n"
+            },
+            timeout=10
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        return {'success': False, 'error': str(e)}
+    return {'success': True}
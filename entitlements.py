@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Entitlement Store for Spark Tracker
+Webhook handlers write customer -> tier rows; the app reads a session's
+tier through a shared cache that is invalidated whenever a row changes
+Built by SavvyTech Automations
+"""
+
+import select
+import threading
+from typing import Callable, Dict, List, Optional
+
+from shared_cache import SharedCache
+from trip_store import TripRepository
+
+TIER_TTL = 300  # Safety net when the writer runs in another process without NOTIFY
+NOTIFY_CHANNEL = "entitlements"
+
+# Stripe subscription statuses that still grant the paid tier
+ACTIVE_STATUSES = ('active', 'trialing', 'past_due')
+# Statuses that end the subscription for good
+ENDED_STATUSES = ('canceled', 'unpaid', 'incomplete_expired')
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+class EntitlementStore:
+    """Cached email -> tier lookups over the repository's entitlements table"""
+
+    def __init__(self, repository: TripRepository, cache: Optional[SharedCache] = None, ttl: float = TIER_TTL):
+        self.repository = repository
+        self.cache = cache or SharedCache(max_entries=10_000, default_ttl=ttl)
+        self.ttl = ttl
+        self._listeners: List[Callable[[str], None]] = []
+        self._listener_thread: Optional[threading.Thread] = None
+
+    def tier_for(self, email: Optional[str]) -> str:
+        """Tier for a signed-in email ('free' if unknown or lapsed); no Stripe call"""
+        if not email:
+            return 'free'
+        email = normalize_email(email)
+        return self.cache.get_or_compute(('tier', email), lambda: self._load_tier(email), ttl=self.ttl)
+
+    def _load_tier(self, email: str) -> str:
+        entitlement = self.repository.get_entitlement(email)
+        if entitlement is None or entitlement['status'] not in ACTIVE_STATUSES:
+            return 'free'
+        return entitlement['tier']
+
+    def grant(self, email: str, tier: str, customer_id: Optional[str] = None,
+              subscription_id: Optional[str] = None, status: str = 'active'):
+        """Upsert an email's entitlement and push the change to readers"""
+        email = normalize_email(email)
+        self.repository.set_entitlement(email, tier, customer_id=customer_id,
+                                        subscription_id=subscription_id, status=status)
+        self.invalidate(email)
+
+    def grant_many(self, rows: List[Dict]):
+        """Upsert a batch of entitlement rows in one transaction, then push each change"""
+        rows = [dict(row, email=normalize_email(row['email'])) for row in rows]
+        self.repository.set_entitlements(rows)
+        for row in rows:
+            self.invalidate(row['email'])
+
+    def update_customer(self, customer_id: str, status: str, tier: Optional[str] = None) -> Optional[str]:
+        """
+        Apply a subscription status change for a Stripe customer
+
+        Args:
+            customer_id: Stripe customer ID
+            status: Stripe subscription status
+            tier: New tier, or None to keep the current one ('free' once the subscription ended)
+
+        Returns:
+            The affected email, or None if the customer is unknown
+        """
+        entitlement = self.repository.get_entitlement_by_customer(customer_id)
+        if entitlement is None:
+            return None
+        if tier is None:
+            tier = 'free' if status in ENDED_STATUSES else entitlement['tier']
+        self.grant(entitlement['email'], tier, customer_id=customer_id, status=status)
+        return entitlement['email']
+
+    def subscribe(self, callback: Callable[[str], None]):
+        """Call back with the email whenever an entitlement changes in this process"""
+        self._listeners.append(callback)
+
+    def invalidate(self, email: str):
+        email = normalize_email(email)
+        self.cache.invalidate(('tier', email))
+        for callback in self._listeners:
+            callback(email)
+        self._publish(email)
+
+    def _pool(self):
+        pool = getattr(self.repository, 'pool', None)
+        return pool if pool is not None and pool.dialect == 'postgres' else None
+
+    def _publish(self, email: str):
+        # Cross-process push: other app servers LISTEN on the channel
+        pool = self._pool()
+        if pool is None:
+            return
+        with pool.connection() as conn:
+            conn.cursor().execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, email))
+
+    def listen(self):
+        """Start a background LISTEN so writes from the webhook service evict this cache (Postgres only)"""
+        pool = self._pool()
+        if pool is None or self._listener_thread is not None:
+            return
+        self._listener_thread = threading.Thread(target=self._listen, args=(pool.url,),
+                                                 name="entitlement-listener", daemon=True)
+        self._listener_thread.start()
+
+    def _listen(self, url: str):
+        import psycopg2
+
+        conn = psycopg2.connect(url)
+        conn.autocommit = True
+        conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+        while True:
+            if select.select([conn], [], [], 60) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                email = conn.notifies.pop(0).payload
+                self.cache.invalidate(('tier', email))
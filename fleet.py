@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Fleet Master Storage for Spark Tracker
+Trips partitioned per driver on disk, each partition with a running
+summary, so fleet analytics merge summaries instead of raw trips.
+A fleet belongs to its Fleet Master; drivers join with the fleet's invite code
+Built by SavvyTech Automations
+"""
+
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from money import from_cents
+from trip_record import Trip, as_storage, as_trip
+
+FLEET_DATA_DIR = os.getenv("FLEET_DATA_DIR", "fleet_data")
+
+
+def _empty_totals() -> Dict:
+    return {'trips': 0, 'gross_cents': 0, 'net_cents': 0, 'miles': 0.0, 'minutes': 0}
+
+
+def _add_totals(into: Dict, other: Dict):
+    for field, value in other.items():
+        into[field] = into.get(field, 0) + value
+
+
+def totals_in_dollars(totals: Dict) -> Dict:
+    """Display copy of a totals dict with cents turned into dollars"""
+    shown = {k: v for k, v in totals.items() if not k.endswith('_cents')}
+    shown['gross'] = from_cents(totals['gross_cents'])
+    shown['net'] = from_cents(totals['net_cents'])
+    return shown
+
+
+class TripSummary:
+    """Mergeable aggregates over a set of trips (overall, per vehicle, per day)"""
+
+    def __init__(self):
+        self.totals = _empty_totals()
+        self.by_vehicle: Dict[str, Dict] = {}
+        self.by_day: Dict[str, Dict] = {}
+
+    def add_trip(self, trip: Dict):
+        trip = as_trip(trip)
+        row = {
+            'trips': 1, 'gross_cents': trip.pay_cents, 'net_cents': trip.net_cents,
+            'miles': trip.miles * 2,  # Round trip, same as calculate_net_earnings
+            'minutes': trip.time
+        }
+        _add_totals(self.totals, row)
+        _add_totals(self.by_vehicle.setdefault(str(trip.vehicle or 'Unknown'), _empty_totals()), row)
+        _add_totals(self.by_day.setdefault(trip.date, _empty_totals()), row)
+
+    def merge(self, other: "TripSummary") -> "TripSummary":
+        _add_totals(self.totals, other.totals)
+        for vehicle, totals in other.by_vehicle.items():
+            _add_totals(self.by_vehicle.setdefault(vehicle, _empty_totals()), totals)
+        for day, totals in other.by_day.items():
+            _add_totals(self.by_day.setdefault(day, _empty_totals()), totals)
+        return self
+
+    def to_dict(self) -> Dict:
+        return {'totals': self.totals, 'by_vehicle': self.by_vehicle, 'by_day': self.by_day}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TripSummary":
+        summary = cls()
+        summary.totals = dict(_empty_totals(), **data.get('totals', {}))
+        summary.by_vehicle = data.get('by_vehicle', {})
+        summary.by_day = data.get('by_day', {})
+        return summary
+
+
+class FleetStore:
+    """One directory per fleet, one partition (trips.jsonl + summary.json) per driver"""
+
+    TRIPS_FILE = "trips.jsonl"
+    SUMMARY_FILE = "summary.json"
+    FLEET_FILE = "fleet.json"  # Owner, invite code and member list
+    LOCK_FILE = ".lock"
+
+    def __init__(self, fleet_id: str, root: str = FLEET_DATA_DIR):
+        self.fleet_id = fleet_id
+        self.path = os.path.join(root, self._safe_name(fleet_id))
+
+    @staticmethod
+    def _safe_name(name: str) -> str:
+        safe = re.sub(r'[^A-Za-z0-9_.@-]', '_', name)
+        if not safe.strip('.'):
+            raise ValueError(f"Invalid fleet or driver name: {name!r}")  # '', '.', '..' escape the data dir
+        return safe
+
+    @classmethod
+    def for_owner(cls, owner: str, root: str = FLEET_DATA_DIR) -> "FleetStore":
+        """The Fleet Master's fleet, created with a fresh invite code on first use"""
+        store = cls(hashlib.sha256(owner.encode('utf-8')).hexdigest()[:16], root)
+        os.makedirs(store.path, exist_ok=True)
+        with store._locked(store.path):
+            if store._load_fleet() is None:
+                store._write_fleet({'owner': owner, 'invite_code': secrets.token_urlsafe(9), 'members': [owner]})
+        return store
+
+    @classmethod
+    def join(cls, invite: str, driver_id: str, root: str = FLEET_DATA_DIR) -> Optional["FleetStore"]:
+        """
+        Add a driver to the fleet an invite ('<fleet_id>-<code>') belongs to
+
+        Returns:
+            The joined FleetStore, or None if the invite is wrong
+        """
+        fleet_id, _, code = invite.strip().partition('-')
+        try:
+            store = cls(fleet_id, root)
+        except ValueError:
+            return None
+        if not os.path.isdir(store.path):
+            return None
+        with store._locked(store.path):
+            fleet = store._load_fleet()
+            if fleet is None or not hmac.compare_digest(code.encode('utf-8'), fleet['invite_code'].encode('utf-8')):
+                return None
+            if driver_id not in fleet['members']:
+                fleet['members'].append(driver_id)
+                store._write_fleet(fleet)
+        return store
+
+    def invite(self) -> str:
+        return f"{self.fleet_id}-{self._load_fleet()['invite_code']}"
+
+    def owner(self) -> Optional[str]:
+        fleet = self._load_fleet()
+        return fleet['owner'] if fleet else None
+
+    def is_member(self, driver_id: str) -> bool:
+        fleet = self._load_fleet()
+        return bool(fleet) and driver_id in fleet['members']
+
+    def _load_fleet(self) -> Optional[Dict]:
+        path = os.path.join(self.path, self.FLEET_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_fleet(self, fleet: Dict):
+        target = os.path.join(self.path, self.FLEET_FILE)
+        with open(target + ".tmp", 'w') as f:
+            json.dump(fleet, f)
+        os.replace(target + ".tmp", target)
+
+    @contextmanager
+    def _locked(self, directory: str):
+        """Exclusive flock on a directory's lock file (serializes writers across processes)"""
+        with open(os.path.join(directory, self.LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def partition_path(self, driver_id: str) -> str:
+        return os.path.join(self.path, self._safe_name(driver_id))
+
+    def drivers(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, name, self.SUMMARY_FILE))
+        )
+
+    def add_trip(self, driver_id: str, trip: Dict):
+        """Append a trip to a member's partition and roll it into the partition summary"""
+        self.add_trips(driver_id, [trip])
+
+    def add_trips(self, driver_id: str, trips: List[Dict]):
+        """Append many trips (e.g. a CSV import) under one lock and one summary rewrite"""
+        if not self.is_member(driver_id):
+            raise PermissionError(f"{driver_id} is not a member of fleet {self.fleet_id}")
+        partition = self.partition_path(driver_id)
+        os.makedirs(partition, exist_ok=True)
+
+        # Append + summary read-modify-write as one unit per partition
+        with self._locked(partition):
+            with open(os.path.join(partition, self.TRIPS_FILE), 'a') as f:
+                f.writelines(json.dumps(as_storage(trip)) + "\n" for trip in trips)
+
+            summary = self.load_summary(driver_id) or TripSummary()
+            for trip in trips:
+                summary.add_trip(trip)
+            self._write_summary(partition, summary)
+
+    def _write_summary(self, partition: str, summary: TripSummary):
+        target = os.path.join(partition, self.SUMMARY_FILE)
+        tmp = target + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(summary.to_dict(), f)
+        os.replace(tmp, target)  # Atomic, readers never see half a file
+
+    def load_summary(self, driver_id: str) -> Optional[TripSummary]:
+        path = os.path.join(self.partition_path(driver_id), self.SUMMARY_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return TripSummary.from_dict(json.load(f))
+
+    def driver_trips(self, driver_id: str) -> Iterator[Trip]:
+        """Stream a driver's raw trips (only needed for per-trip reports)"""
+        path = os.path.join(self.partition_path(driver_id), self.TRIPS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield Trip.from_dict(json.loads(line))
+
+    def fleet_summary(self) -> Dict:
+        """
+        Fleet-level aggregates merged from per-driver summaries
+
+        Returns:
+            Dict with the merged fleet TripSummary and per-driver totals
+        """
+        fleet = TripSummary()
+        per_driver = {}
+        for driver_id in self.drivers():
+            summary = self.load_summary(driver_id)
+            per_driver[driver_id] = summary.totals
+            fleet.merge(summary)
+
+        return {
+            'fleet': fleet,
+            'per_driver': per_driver
+        }
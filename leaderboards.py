@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Community Leaderboards for Spark Tracker
+Anonymized weekly awards kept in bounded top-k heaps that are
+seeded from the shared trip store and updated as trips are saved,
+so the Community page reads a snapshot
+Built by SavvyTech Automations
+"""
+
+import hashlib
+import heapq
+import hmac
+import itertools
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from email_auth import secret_key
+from money import from_cents
+from trip_record import as_trip
+
+
+class CommunityLeaderboards:
+    """Process-wide weekly leaderboards across all drivers"""
+
+    TOP_K = 5
+    WEEKS_KEPT = 8  # Older weeks are dropped to keep memory bounded
+
+    SEED_WEEKS = 2  # Current and previous week are rebuilt from the store on creation
+
+    def __init__(self, k: int = TOP_K, repository=None, today: Optional[date] = None):
+        self.k = k
+        self.weeks: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()  # Tie-breaker so heap entries never compare dicts
+        if repository is not None:
+            self.seed(repository, today)
+
+    def seed(self, repository, today: Optional[date] = None) -> int:
+        """
+        Load recent weeks from the shared store (TripRepository.trips_since)
+
+        Heaps start from what every worker and CSV import has written,
+        not just the trips saved through this process since it started.
+
+        Returns:
+            Number of trips recorded
+        """
+        today = today or date.today()
+        start = today - timedelta(days=today.weekday(), weeks=self.SEED_WEEKS - 1)  # Monday
+        trips = repository.trips_since(start.isoformat())
+        for driver_id, trip in trips:
+            self.record_trip(driver_id, trip)
+        return len(trips)
+
+    @staticmethod
+    def week_key(day: date) -> str:
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+
+    @staticmethod
+    def alias(driver_id: str) -> str:
+        """Anonymous, stable display name for a driver"""
+        # Keyed, so knowing a driver's email doesn't reveal their row on the board
+        digest = hmac.new(secret_key(), b"leaderboard-alias:" + driver_id.encode('utf-8'),
+                          hashlib.sha256).hexdigest()[:6].upper()
+        return f"Driver #{digest}"
+
+    def _week(self, key: str) -> Dict:
+        week = self.weeks.get(key)
+        if week is None:
+            week = {
+                'worst_pay_per_mile': [],   # Max-heap via negated $/mile
+                'best_tip': [],             # Min-heap of tips
+                'net_totals': {},           # alias -> weekly net cents
+                'top_weekly_net': [],       # Min-heap of (net cents, alias)
+                'snapshot': None
+            }
+            self.weeks[key] = week
+            for stale in sorted(self.weeks)[:-self.WEEKS_KEPT]:
+                del self.weeks[stale]
+        return week
+
+    def record_trip(self, driver_id: str, trip: Dict):
+        """Update this week's heaps with one saved trip"""
+        trip = as_trip(trip)
+        key = self.week_key(date.fromisoformat(trip.date))
+        name = self.alias(driver_id)
+        entry = {'driver': name, 'pay': trip.pay, 'miles': trip.miles * 2}
+
+        with self._lock:
+            week = self._week(key)
+
+            if trip.miles > 0:
+                pay_per_mile = trip.pay / (trip.miles * 2)
+                self._push_bounded(week['worst_pay_per_mile'], (-pay_per_mile, next(self._seq), entry))
+
+            if trip.tip_cents:  # None when no tip was entered
+                self._push_bounded(week['best_tip'], (trip.tip_cents, next(self._seq), dict(entry, tip=trip.tip)))
+
+            self._update_weekly_net(week, name, trip.net_cents)
+            week['snapshot'] = None
+
+    def _push_bounded(self, heap: List, item):
+        if len(heap) < self.k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def _update_weekly_net(self, week: Dict, name: str, net: int):
+        totals = week['net_totals']
+        previous = totals.get(name, 0)
+        totals[name] = previous + net
+        top = week['top_weekly_net']
+
+        if any(member == name for _, member in top):
+            if net < 0:
+                # A member dropped; someone outside the heap may now outrank them
+                week['top_weekly_net'] = heapq.nlargest(self.k, ((v, n) for n, v in totals.items()))
+                heapq.heapify(week['top_weekly_net'])
+            else:
+                week['top_weekly_net'] = [(totals[name] if member == name else value, member) for value, member in top]
+                heapq.heapify(week['top_weekly_net'])
+        else:
+            self._push_bounded(top, (totals[name], name))
+
+    def snapshot(self, day: Optional[date] = None) -> Dict:
+        """Precomputed, sorted leaderboards for the week containing day"""
+        key = self.week_key(day or date.today())
+        with self._lock:
+            week = self.weeks.get(key)
+            if week is None:
+                return {'week': key, 'worst_pay_per_mile': [], 'best_tip': [], 'top_weekly_net': []}
+            if week['snapshot'] is None:
+                week['snapshot'] = {
+                    'week': key,
+                    'worst_pay_per_mile': [
+                        dict(e, pay_per_mile=-ppm) for ppm, _, e in sorted(week['worst_pay_per_mile'], reverse=True)
+                    ],
+                    'best_tip': [e for _, _, e in sorted(week['best_tip'], reverse=True)],
+                    'top_weekly_net': [
+                        {'driver': n, 'net': from_cents(v)} for v, n in sorted(week['top_weekly_net'], reverse=True)
+                    ]
+                }
+            return week['snapshot']
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Fixed-Point Money Helpers for Spark Tracker
+Money is stored and summed as int64 cents; dollars only exist at the
+edges (inputs, charts, CSV), converted in bulk with NumPy
+Built by SavvyTech Automations
+"""
+
+from typing import Iterable, Union
+
+import numpy as np
+
+
+def to_cents(dollars: float) -> int:
+    """Dollar amount -> integer cents (rounded to the nearest cent)"""
+    return int(round(float(dollars) * 100))
+
+
+def from_cents(cents: int) -> float:
+    return cents / 100
+
+
+def to_cents_array(dollars: Iterable[float]) -> np.ndarray:
+    """Vectorized dollars -> int64 cents"""
+    return np.rint(np.asarray(dollars, dtype=np.float64) * 100).astype(np.int64)
+
+
+def from_cents_array(cents: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+    """Vectorized int64 cents -> float dollars (display only, never re-summed)"""
+    return np.asarray(cents, dtype=np.int64) / 100
+
+
+def format_cents(cents: int) -> str:
+    """Exact '$1,234.56' string without going through float"""
+    sign = "-" if cents < 0 else ""
+    dollars, remainder = divmod(abs(int(cents)), 100)
+    return f"{sign}${dollars:,}.{remainder:02d}"
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Structured Payment Logging for Spark Tracker
+Handlers log JSON events through a QueueHandler; a background
+QueueListener does the stdout/file I/O so webhooks never block on it
+Built by SavvyTech Automations
+
+Summarize a log:  python payment_logging.py payments.log
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import statistics
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+LOGGER_NAME = "spark.payments"
+PAYMENT_LOG_FILE = os.getenv("PAYMENT_LOG_FILE")  # JSON lines; stderr only when unset
+PAYMENT_LOG_LEVEL = os.getenv("PAYMENT_LOG_LEVEL", "INFO")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, event, then the record's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['error'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class PaymentQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps msg as the event name and ships the traceback as fields['error']"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() folds the traceback into msg and drops exc_info
+        record = copy.copy(record)
+        fields = dict(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            fields['error'] = logging.Formatter().formatException(record.exc_info)
+        record.fields = fields
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+
+def configure_payment_logging(handlers: Optional[List[logging.Handler]] = None,
+                              level: str = PAYMENT_LOG_LEVEL) -> logging.Logger:
+    """
+    Route the payments logger through a queue (idempotent; later calls swap the sinks)
+
+    Args:
+        handlers: Sinks the listener thread writes to (default: stderr, plus PAYMENT_LOG_FILE if set)
+        level: Minimum level to log
+
+    Returns:
+        The configured payments logger
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _lock:
+        if handlers is None:
+            handlers = [logging.StreamHandler(sys.stderr)]
+            if PAYMENT_LOG_FILE:
+                handlers.append(logging.FileHandler(PAYMENT_LOG_FILE))
+        formatter = JsonFormatter()
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        if _listener is not None:
+            _listener.stop()  # Flushes what's queued to the old sinks
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        logger.addHandler(PaymentQueueHandler(log_queue))
+        logger.setLevel(level)
+        logger.propagate = False
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    return logger
+
+
+def get_payment_logger() -> logging.Logger:
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        logger = configure_payment_logging()
+    return logger
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    """Log a named event with structured fields (ids, timings, ...)"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+def _stop_listener():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def summarize(path: str) -> Dict[str, Dict]:
+    """Count and duration percentiles per event name from a JSON-lines log"""
+    durations: Dict[str, List[float]] = {}
+    counts: Dict[str, int] = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            name = entry.get('event')
+            if entry.get('event_type'):
+                name = f"{name} {entry['event_type']}"
+            counts[name] = counts.get(name, 0) + 1
+            if 'duration_ms' in entry:
+                durations.setdefault(name, []).append(entry['duration_ms'])
+
+    summary = {}
+    for name, count in counts.items():
+        timings = sorted(durations.get(name, []))
+        summary[name] = {'count': count}
+        if timings:
+            summary[name]['p50_ms'] = statistics.median(timings)
+            summary[name]['max_ms'] = timings[-1]
+    return summary
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python payment_logging.py <payments.log>")
+        sys.exit(1)
+    for name, stats in sorted(summarize(sys.argv[1]).items(), key=lambda kv: -kv[1]['count']):
+        timing = f"  p50 {stats['p50_ms']:.2f} ms  max {stats['max_ms']:.2f} ms" if 'p50_ms' in stats else ""
+        print(f"{stats['count']:>8}  {name}{timing}")
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Subscription Reconciliation for Spark Tracker
+Recovers entitlements that drifted while the webhook endpoint was down:
+pages Stripe subscriptions on a bounded worker pool, diffs them against
+the local entitlement store and applies fixes in batches
+Built by SavvyTech Automations
+
+Usage:
+    python reconcile.py --dry-run
+    python reconcile.py --api-base http://localhost:12111   # stripe-mock
+    python reconcile.py --replay-events 72                  # also re-dispatch recent webhook events
+Dead-lettered webhook events are replayed on every run that isn't --dry-run.
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+import stripe
+
+from entitlements import ACTIVE_STATUSES, EntitlementStore, normalize_email
+from stripe_integration import SparkPaymentProcessor, load_price_ids
+from trip_store import ConnectionPool, DATABASE_URL, SqlTripRepository
+from webhook_idempotency import EventIdempotency
+
+# Each status is listed on its own cursor, so statuses page in parallel
+SUBSCRIPTION_STATUSES = ('active', 'trialing', 'past_due', 'unpaid', 'canceled',
+                         'incomplete', 'incomplete_expired', 'paused')
+REPLAY_EVENT_TYPES = ['checkout.session.completed', 'customer.subscription.updated',
+                      'customer.subscription.deleted', 'invoice.payment_failed']
+LOOKUP_KEY_TIERS = {'spark_tracker_basic_monthly': 'basic', 'spark_tracker_pro_monthly': 'pro'}
+# Status precedence when one email has several subscriptions
+STATUS_RANK = {status: rank for rank, status in enumerate(('active', 'trialing', 'past_due'))}
+
+
+def _plain(obj) -> Dict:
+    """StripeObject -> plain dict (works across stripe-python versions)"""
+    return json.loads(str(obj))
+
+
+def list_subscriptions(status: str) -> List[Dict]:
+    """Every subscription with one status, customer expanded so no per-row lookups"""
+    return [
+        _plain(sub) for sub in
+        stripe.Subscription.list(status=status, expand=['data.customer'], limit=100).auto_paging_iter()
+    ]
+
+
+def subscription_tier(subscription: Dict, price_tiers: Dict[str, str]) -> Optional[str]:
+    """Paid tier a subscription is for, from its price id, lookup key or metadata"""
+    for item in (subscription.get('items') or {}).get('data', []):
+        price = item.get('price') or {}
+        tier = price_tiers.get(price.get('id')) or LOOKUP_KEY_TIERS.get(price.get('lookup_key'))
+        if tier:
+            return tier
+    return (subscription.get('metadata') or {}).get('tier')
+
+
+def live_customers(subscriptions: Iterable[Dict]) -> Set[str]:
+    """Emails and customer ids with a subscription that still grants access, whatever its tier"""
+    live = set()
+    for sub in subscriptions:
+        customer = sub.get('customer') or {}
+        if sub.get('status') not in ACTIVE_STATUSES or not isinstance(customer, dict):
+            continue
+        if customer.get('email'):
+            live.add(normalize_email(customer['email']))
+        if customer.get('id'):
+            live.add(customer['id'])
+    return live
+
+
+def desired_entitlements(subscriptions: Iterable[Dict], price_tiers: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    What the entitlements table should say, per email
+
+    Args:
+        subscriptions: Plain subscription dicts with the customer expanded
+        price_tiers: Price ID -> tier
+
+    Returns:
+        Dict of email -> entitlement row, one per email (the best subscription wins)
+    """
+    desired = {}
+    for sub in subscriptions:
+        customer = sub.get('customer') or {}
+        email = customer.get('email') if isinstance(customer, dict) else None
+        tier = subscription_tier(sub, price_tiers)
+        if not email or not tier:
+            continue  # Not a Spark Tracker subscription we can attribute
+
+        status = sub.get('status')
+        row = {
+            'email': normalize_email(email),
+            'customer_id': customer.get('id'),
+            'subscription_id': sub.get('id'),
+            'tier': tier if status in ACTIVE_STATUSES else 'free',
+            'status': status,
+            'rank': (STATUS_RANK.get(status, len(STATUS_RANK)), -(sub.get('created') or 0))
+        }
+        current = desired.get(row['email'])
+        if current is None or row['rank'] < current['rank']:
+            desired[row['email']] = row
+
+    for row in desired.values():
+        row.pop('rank')
+    return desired
+
+
+def diff_entitlements(desired: Dict[str, Dict], local: List[Dict], live: Set[str]) -> List[Dict]:
+    """
+    Rows to upsert so the local store matches Stripe
+
+    Args:
+        desired: desired_entitlements' rows
+        local: The entitlement store's rows
+        live: live_customers' emails and customer ids; never revoked, since a live
+            subscription whose tier can't be read (e.g. an inline price) still pays
+
+    Returns:
+        Fix rows, each with its 'previous' tier/status
+    """
+    local_by_email = {normalize_email(row['email']): row for row in local}
+    fixes = []
+    for email, row in desired.items():
+        current = local_by_email.get(email)
+        if row['tier'] == 'free' and (current is None or email in live or current['customer_id'] in live):
+            continue  # Nothing to revoke, or still paying on a subscription we can't attribute
+        if current is None or (current['tier'], current['status']) != (row['tier'], row['status']):
+            fixes.append(dict(row, previous=current and f"{current['tier']}/{current['status']}"))
+
+    # Paid locally but Stripe has no live subscription for them at all
+    for email, current in local_by_email.items():
+        if email not in desired and current['customer_id'] and current['tier'] != 'free' \
+                and email not in live and current['customer_id'] not in live:
+            fixes.append({'email': email, 'customer_id': current['customer_id'],
+                          'subscription_id': current['subscription_id'], 'tier': 'free',
+                          'status': 'canceled', 'previous': f"{current['tier']}/{current['status']}"})
+    return fixes
+
+
+def apply_fixes(store: EntitlementStore, fixes: List[Dict], batch_size: int) -> int:
+    """Write fixes batch by batch (one transaction each)"""
+    for start in range(0, len(fixes), batch_size):
+        batch = [{k: v for k, v in fix.items() if k != 'previous'} for fix in fixes[start:start + batch_size]]
+        store.grant_many(batch)
+    return len(fixes)
+
+
+def replay_events(processor: SparkPaymentProcessor, hours: int) -> Dict:
+    """
+    Re-dispatch recent webhook events oldest-first; already processed ids are skipped
+
+    A failed event's claim is released, so the next run (or Stripe's own retry) tries it again.
+    """
+    since = int(time.time()) - hours * 3600
+    events = [
+        _plain(event) for event in
+        stripe.Event.list(created={'gte': since}, types=REPLAY_EVENT_TYPES, limit=100).auto_paging_iter()
+    ]
+    counts = {'replayed': 0, 'skipped': 0, 'failed': 0}
+    for event in sorted(events, key=lambda e: e.get('created', 0)):
+        if processor.idempotency is not None and not processor.idempotency.claim(event):
+            counts['skipped'] += 1
+            continue
+        try:
+            ok = processor.dispatch_event(event).get('success')
+        except Exception:
+            processor.logger.exception('replay_handler_error', extra={'fields': {
+                'event_id': event.get('id'), 'event_type': event.get('type')}})
+            ok = False
+        if ok:
+            counts['replayed'] += 1
+        else:
+            if processor.idempotency is not None:
+                processor.idempotency.release(event['id'])
+            counts['failed'] += 1
+    return counts
+
+
+def replay_failed_events(processor: SparkPaymentProcessor) -> Dict:
+    """Re-dispatch events the webhook service dead-lettered; their claims are still held"""
+    counts = {'replayed': 0, 'failed': 0}
+    for event in processor.idempotency.failed_events():
+        try:
+            ok = processor.dispatch_event(event).get('success')
+        except Exception:
+            ok = False  # Stays dead-lettered for the next run
+        if ok:
+            processor.idempotency.resolve(event['id'])
+            counts['replayed'] += 1
+        else:
+            counts['failed'] += 1
+    return counts
+
+
+def reconcile(database_url: str = DATABASE_URL, workers: int = 4, batch_size: int = 200,
+              dry_run: bool = False, replay_hours: int = 0) -> Dict:
+    """
+    Bring the local entitlement store in line with Stripe
+
+    Args:
+        database_url: Shared store to repair
+        workers: Concurrent Stripe list cursors
+        batch_size: Entitlement rows per write transaction
+        dry_run: Report fixes without writing
+        replay_hours: Also replay webhook events from this many hours back (0 = off)
+
+    Returns:
+        Dict with counts and the list of fixes
+    """
+    repository = SqlTripRepository(ConnectionPool(database_url))
+    store = EntitlementStore(repository)
+    price_tiers = {price_id: tier for tier, price_id in load_price_ids().items()}
+
+    result = {}
+    if not dry_run:
+        processor = SparkPaymentProcessor(idempotency=EventIdempotency(repository), entitlements=store)
+        result['dead_letters'] = replay_failed_events(processor)
+        if replay_hours:
+            result['events'] = replay_events(processor, replay_hours)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pages = list(pool.map(list_subscriptions, SUBSCRIPTION_STATUSES))
+    subscriptions = [sub for page in pages for sub in page]
+
+    desired = desired_entitlements(subscriptions, price_tiers)
+    fixes = diff_entitlements(desired, repository.list_entitlements(), live_customers(subscriptions))
+    applied = 0 if dry_run else apply_fixes(store, fixes, batch_size)
+
+    result.update({
+        'subscriptions': len(subscriptions),
+        'customers': len(desired),
+        'fixes': fixes,
+        'applied': applied,
+        'seconds': time.perf_counter() - start
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile local entitlements with Stripe subscriptions")
+    parser.add_argument('--api-base', default=os.getenv("STRIPE_API_BASE"),
+                        help="Stripe API base URL, e.g. http://localhost:12111 for stripe-mock")
+    parser.add_argument('--api-key', default=os.getenv("STRIPE_SECRET_KEY"))
+    parser.add_argument('--database-url', default=DATABASE_URL)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--replay-events', type=int, default=0, metavar='HOURS')
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    if args.api_base:
+        stripe.api_base = args.api_base
+        stripe.api_key = args.api_key or "sk_test_123"  # stripe-mock accepts any test key
+    elif args.api_key:
+        stripe.api_key = args.api_key
+
+    print("🔄 Reconciling entitlements with Stripe...")
+    result = reconcile(args.database_url, workers=args.workers, batch_size=args.batch_size,
+                       dry_run=args.dry_run, replay_hours=args.replay_events)
+
+    dead_letters = result.get('dead_letters')
+    if dead_letters and (dead_letters['replayed'] or dead_letters['failed']):
+        print(f"📨 Dead letters: {dead_letters['replayed']} replayed, {dead_letters['failed']} still failing")
+    if 'events' in result:
+        events = result['events']
+        print(f"📨 Events: {events['replayed']} replayed, {events['skipped']} already processed, "
+              f"{events['failed']} failed (retried next run)")
+    print(f"✓ {result['subscriptions']} subscriptions, {result['customers']} customers "
+          f"in {result['seconds']:.2f}s")
+    for fix in result['fixes']:
+        print(f"   {fix['email']}: {fix['previous'] or 'missing'} -> {fix['tier']}/{fix['status']}")
+    if args.dry_run:
+        print(f"🧪 Dry run: {len(result['fixes'])} fixes not applied")
+    else:
+        print(f"✅ Applied {result['applied']} fixes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Parallel Report Runner for Spark Tracker
+Fans per-driver aggregation out to a process pool over the fleet's
+partitioned trip files, merges partial summaries and streams reports
+Built by SavvyTech Automations
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fleet import FleetStore, TripSummary
+from money import from_cents
+from trip_record import Trip
+
+# Default pool size ceiling; the app shares its host with every other session
+MAX_REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))
+
+
+def build_driver_report(job: Tuple[str, str, Optional[int]]) -> Dict:
+    """
+    Aggregate one driver partition (runs inside a worker process)
+
+    Args:
+        job: (partition path, driver id, tax/report year or None for all)
+
+    Returns:
+        Dict with the driver's mergeable summary and report figures
+    """
+    partition, driver_id, year = job
+    summary = TripSummary()
+    best_day: Dict[str, int] = {}
+    prefix = f"{year}-" if year else ""
+
+    path = os.path.join(partition, FleetStore.TRIPS_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                trip = Trip.from_dict(json.loads(line))
+                if not trip.date.startswith(prefix):
+                    continue
+                summary.add_trip(trip)
+                best_day[trip.date] = best_day.get(trip.date, 0) + trip.net_cents
+
+    totals = summary.totals
+    hours = totals['minutes'] / 60
+    net = from_cents(totals['net_cents'])
+    return {
+        'driver_id': driver_id,
+        'summary': summary.to_dict(),
+        'report': {
+            'trips': totals['trips'],
+            'gross': from_cents(totals['gross_cents']),
+            'net': net,
+            'miles': totals['miles'],
+            'net_per_hour': net / hours if hours > 0 else 0,
+            'net_per_mile': net / totals['miles'] if totals['miles'] > 0 else 0,
+            'best_day': max(best_day, key=best_day.get) if best_day else None
+        }
+    }
+
+
+class ReportRunner:
+    """Runs per-driver reports for a fleet on a process pool"""
+
+    def __init__(self, store: FleetStore, workers: Optional[int] = None):
+        self.store = store
+        self.workers = workers or min(os.cpu_count() or 1, MAX_REPORT_WORKERS)
+        self.merged = TripSummary()
+
+    @staticmethod
+    def _mp_context():
+        # Never fork the threaded Streamlit server (locks held by other threads would be copied);
+        # forkserver children start from a clean single-threaded process
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+    def _jobs(self, year: Optional[int]) -> List[Tuple[str, str, Optional[int]]]:
+        return [(self.store.partition_path(d), d, year) for d in self.store.drivers()]
+
+    def iter_reports(self, year: Optional[int] = None) -> Iterator[Dict]:
+        """Yield each driver's report as soon as it finishes, merging into self.merged"""
+        self.merged = TripSummary()
+        jobs = self._jobs(year)
+
+        if self.workers == 1 or len(jobs) <= 1:
+            # Sequential baseline, no pool overhead
+            results = map(build_driver_report, jobs)
+            for partial in results:
+                self.merged.merge(TripSummary.from_dict(partial['summary']))
+                yield partial
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs)), mp_context=self._mp_context()) as pool:
+            futures = [pool.submit(build_driver_report, job) for job in jobs]
+            for future in as_completed(futures):
+                partial = future.result()
+                self.merged.merge(TripSummary.from_dict(partial['summary']))
+                yield partial
+
+    def run(self, year: Optional[int] = None) -> Dict:
+        """Run every report and return them with the merged fleet summary"""
+        reports = list(self.iter_reports(year))
+        return {'reports': reports, 'fleet': self.merged}
+
+
+def benchmark(drivers: int = 64, trips_per_driver: int = 5000, max_workers: Optional[int] = None):
+    """Time report generation over a synthetic fleet from 1 to N workers"""
+    import random
+    import tempfile
+
+    max_workers = max_workers or os.cpu_count() or 1
+    root = tempfile.mkdtemp(prefix="spark_fleet_bench_")
+    store = FleetStore("bench", root=root)
+
+    print(f"🧪 Writing {drivers} drivers x {trips_per_driver} trips to {root}...")
+    vehicles = ["Sedan", "Coupe", "Minivan", "Hybrid", "Electric"]
+    for d in range(drivers):
+        partition = store.partition_path(f"driver{d:04d}")
+        os.makedirs(partition, exist_ok=True)
+        with open(os.path.join(partition, FleetStore.TRIPS_FILE), 'w') as f:
+            for _ in range(trips_per_driver):
+                pay_cents = random.randint(600, 4000)
+                f.write(json.dumps({
+                    'date': f"2026-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+                    'pay_cents': pay_cents, 'net_cents': pay_cents * 7 // 10, 'miles': round(random.uniform(1, 20), 1),
+                    'time': random.randint(10, 90), 'vehicle': random.choice(vehicles)
+                }) + "\n")
+        with open(os.path.join(partition, FleetStore.SUMMARY_FILE), 'w') as f:
+            json.dump(TripSummary().to_dict(), f)
+
+    worker_counts = sorted({1, *[w for w in (2, 4, 8, 16, 32) if w < max_workers], max_workers})
+    baseline = None
+    print(f"\n{'workers':>8} {'seconds':>10} {'drivers/s':>10} {'speedup':>8}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        ReportRunner(store, workers=workers).run(year=2026)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {drivers / elapsed:>10.1f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    import sys
+
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    benchmark(max_workers=max_workers)
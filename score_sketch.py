@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Streaming Score Sketch for Spark Tracker
+KLL quantile sketch that keeps each driver's offer-score distribution
+in bounded memory, so deal ratings follow the driver's own percentiles
+Built by SavvyTech Automations
+"""
+
+import math
+import random
+from typing import Dict, List, Optional
+
+
+class ScoreSketch:
+    """KLL quantile sketch over trip scores (bounded size, any history length)"""
+
+    DEFAULT_K = 128     # Accuracy knob: rank error ~ 1.7 / k
+    DECAY = 2 / 3       # Capacity shrink factor per lower level
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        """Max items held at a level before it is compacted"""
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * self.DECAY ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def update(self, score: float):
+        """Add one offer score to the sketch"""
+        self.compactors[0].append(float(score))
+        self.n += 1
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def _compress(self):
+        """Compact the first full level, promoting every other item upward"""
+        for level, items in enumerate(self.compactors):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                # Odd leftovers stay behind so total weight is preserved
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = self._rng.randint(0, 1)
+                self.compactors[level + 1].extend(items[offset::2])
+                self.compactors[level] = keep
+                return
+
+    def rank(self, score: float) -> float:
+        """Fraction of recorded scores that are <= score (0.0 - 1.0)"""
+        if self.n == 0:
+            return 0.0
+        below = 0
+        for level, items in enumerate(self.compactors):
+            weight = 1 << level
+            below += weight * sum(1 for item in items if item <= score)
+        return min(below / self.n, 1.0)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate score at percentile q (0.0 - 1.0)"""
+        if self.n == 0:
+            return None
+        weighted = sorted(
+            (item, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for item in items
+        )
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for item, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return item
+        return weighted[-1][0]
+
+    def to_dict(self) -> Dict:
+        """Serialize for storage"""
+        return {'k': self.k, 'n': self.n, 'compactors': [list(c) for c in self.compactors]}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScoreSketch":
+        """Restore a sketch saved with to_dict()"""
+        sketch = cls(k=data.get('k', cls.DEFAULT_K))
+        sketch.n = data.get('n', 0)
+        sketch.compactors = [list(c) for c in data.get('compactors', [[]])] or [[]]
+        return sketch
@@ -5,6 +5,8 @@ Setup Stripe products and prices for Spark Tracker Pro
 import stripe
 import os
 
+from stripe_integration import SparkPaymentProcessor
+
 # Get API key from environment or use provided key
 import sys
 
@@ -20,97 +22,114 @@ if not STRIPE_SECRET:
 
 stripe.api_key = STRIPE_SECRET
 
+# Plans to provision; lookup_key lets later runs find the price in one filtered call
+PLANS = {
+    "basic": {
+        "product_name": "Spark Tracker - Regular",
+        "description": "Track trips and earnings with essential features",
+        "unit_amount": SparkPaymentProcessor.PRICE_BASIC_MONTHLY,  # Same amounts the app advertises
+        "lookup_key": "spark_tracker_basic_monthly",
+    },
+    "pro": {
+        "product_name": "Spark Tracker - Pro",
+        "description": "Advanced analytics, unlimited trips, and premium features",
+        "unit_amount": SparkPaymentProcessor.PRICE_PRO_MONTHLY,
+        "lookup_key": "spark_tracker_pro_monthly",
+    },
+}
+
+
+def index_products_by_name(names):
+    """Name -> product for the wanted names, paging through every active product"""
+    wanted = set(names)
+    index = {}
+    for product in stripe.Product.list(active=True, limit=100).auto_paging_iter():
+        if product.name in wanted and product.name not in index:
+            index[product.name] = product
+            if len(index) == len(wanted):
+                break  # Found everything, stop paging
+    return index
+
+
+def index_prices(product_id):
+    """(unit_amount, currency, interval) -> price for one product's active prices"""
+    index = {}
+    for price in stripe.Price.list(product=product_id, active=True, limit=100).auto_paging_iter():
+        if price.recurring:
+            index.setdefault((price.unit_amount, price.currency, price.recurring.interval), price)
+    return index
+
+
 def setup_products_and_prices():
     """Create or verify Stripe products and prices"""
 
-    print("🔍 Checking existing products...")
-
-    # List existing products
-    products = stripe.Product.list(limit=100)
-
-    regular_product = None
-    pro_product = None
-
-    # Check if products already exist
-    for product in products.data:
-        if product.name == "Spark Tracker - Regular":
-            regular_product = product
-            print(f"✓ Found Regular product: {product.id}")
-        elif product.name == "Spark Tracker - Pro":
-            pro_product = product
-            print(f"✓ Found Pro product: {product.id}")
-
-    # Create Regular product if it doesn't exist
-    if not regular_product:
-        print("\n📦 Creating Regular product...")
-        regular_product = stripe.Product.create(
-            name="Spark Tracker - Regular",
-            description="Track trips and earnings with essential features",
-        )
-        print(f"✓ Created Regular product: {regular_product.id}")
-
-    # Create Pro product if it doesn't exist
-    if not pro_product:
-        print("\n📦 Creating Pro product...")
-        pro_product = stripe.Product.create(
-            name="Spark Tracker - Pro",
-            description="Advanced analytics, unlimited trips, and premium features",
-        )
-        print(f"✓ Created Pro product: {pro_product.id}")
-
-    # Check existing prices
-    print("\n🔍 Checking existing prices...")
-    prices = stripe.Price.list(limit=100)
-
-    regular_price = None
-    pro_price = None
-
-    for price in prices.data:
-        if price.product == regular_product.id and price.unit_amount == 399:
-            regular_price = price
-            print(f"✓ Found Regular price: {price.id} ($3.99/mo)")
-        elif price.product == pro_product.id and price.unit_amount == 699:
-            pro_price = price
-            print(f"✓ Found Pro price: {price.id} ($6.99/mo)")
-
-    # Create Regular price if it doesn't exist
-    if not regular_price:
-        print("\n💰 Creating Regular price ($3.99/mo)...")
-        regular_price = stripe.Price.create(
-            product=regular_product.id,
-            unit_amount=399,  # $3.99
-            currency="usd",
-            recurring={"interval": "month"},
-        )
-        print(f"✓ Created Regular price: {regular_price.id}")
-
-    # Create Pro price if it doesn't exist
-    if not pro_price:
-        print("\n💰 Creating Pro price ($6.99/mo)...")
-        pro_price = stripe.Price.create(
-            product=pro_product.id,
-            unit_amount=699,  # $6.99
-            currency="usd",
-            recurring={"interval": "month"},
-        )
-        print(f"✓ Created Pro price: {pro_price.id}")
+    print("🔍 Checking existing prices by lookup key...")
+    lookup_keys = [plan["lookup_key"] for plan in PLANS.values()]
+    by_lookup_key = {
+        price.lookup_key: price
+        for price in stripe.Price.list(lookup_keys=lookup_keys, active=True, expand=["data.product"], limit=100).auto_paging_iter()
+    }
+
+    missing = [tier for tier, plan in PLANS.items() if plan["lookup_key"] not in by_lookup_key]
+    products = {}
+    if missing:
+        print("🔍 Checking existing products...")
+        products = index_products_by_name(PLANS[tier]["product_name"] for tier in missing)
+
+    result = {}
+    for tier, plan in PLANS.items():
+        label = plan["product_name"].split(" - ")[-1]
+        price = by_lookup_key.get(plan["lookup_key"])
+        if price is not None and price.unit_amount != plan["unit_amount"]:
+            # Stale amount; a new price below takes over the lookup key
+            print(f"⚠️ {label} price {price.id} is ${price.unit_amount/100:.2f}, replacing it")
+            products[plan["product_name"]] = price.product
+            price = None
+
+        if price is not None:
+            product = price.product
+            print(f"✓ Found {label} price: {price.id} (${price.unit_amount/100:.2f}/mo)")
+        else:
+            product = products.get(plan["product_name"])
+            price = None
+            if product:
+                print(f"✓ Found {label} product: {product.id}")
+                price = index_prices(product.id).get((plan["unit_amount"], "usd", "month"))
+            else:
+                print(f"\n📦 Creating {label} product...")
+                product = stripe.Product.create(name=plan["product_name"], description=plan["description"])
+                print(f"✓ Created {label} product: {product.id}")
+
+            if price:
+                # Tag it so the next run finds it with the lookup_keys filter
+                price = stripe.Price.modify(price.id, lookup_key=plan["lookup_key"], transfer_lookup_key=True)
+                print(f"✓ Found {label} price: {price.id} (${price.unit_amount/100:.2f}/mo)")
+            else:
+                print(f"\n💰 Creating {label} price (${plan['unit_amount']/100:.2f}/mo)...")
+                price = stripe.Price.create(
+                    product=product.id,
+                    unit_amount=plan["unit_amount"],
+                    currency="usd",
+                    recurring={"interval": "month"},
+                    lookup_key=plan["lookup_key"],
+                    transfer_lookup_key=True,
+                )
+                print(f"✓ Created {label} price: {price.id}")
+
+        result[tier] = (product, price)
 
     print("\n" + "="*60)
     print("✅ STRIPE SETUP COMPLETE")
     print("="*60)
-    print(f"\nRegular Plan: {regular_product.name}")
-    print(f"  Product ID: {regular_product.id}")
-    print(f"  Price ID: {regular_price.id}")
-    print(f"  Amount: ${regular_price.unit_amount/100:.2f}/mo")
-
-    print(f"\nPro Plan: {pro_product.name}")
-    print(f"  Product ID: {pro_product.id}")
-    print(f"  Price ID: {pro_price.id}")
-    print(f"  Amount: ${pro_price.unit_amount/100:.2f}/mo")
+    for tier, (product, price) in result.items():
+        print(f"\n{tier.title()} Plan: {product.name}")
+        print(f"  Product ID: {product.id}")
+        print(f"  Price ID: {price.id}")
+        print(f"  Amount: ${price.unit_amount/100:.2f}/mo")
 
     return {
-        "regular_price_id": regular_price.id,
-        "pro_price_id": pro_price.id,
+        "basic_price_id": result["basic"][1].id,
+        "pro_price_id": result["pro"][1].id,
     }
 
 if __name__ == "__main__":
@@ -119,5 +138,5 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("📋 ADD THESE TO YOUR .streamlit/secrets.toml:")
     print("="*60)
-    print(f'REGULAR_PRICE_ID = "{result["regular_price_id"]}"')
+    print(f'BASIC_PRICE_ID = "{result["basic_price_id"]}"')
     print(f'PRO_PRICE_ID = "{result["pro_price_id"]}"')
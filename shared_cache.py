@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Shared Aggregate Cache for Spark Tracker
+Process-wide TTL + LRU cache for data every session shares, with
+single-flight recomputation so an expired key is rebuilt exactly once
+Built by SavvyTech Automations
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Flight:
+    """One in-progress recomputation that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.invalidated = False  # Set if the key was invalidated mid-compute; the value isn't cached
+
+
+class SharedCache:
+    """Thread-safe TTL cache with size-bounded LRU eviction and single-flight loads"""
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'computes': 0, 'evictions': 0}
+
+    def _fresh(self, key: Hashable):
+        """Return (True, value) for a live entry; caller must hold the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            hit, value = self._fresh(key)
+            self.stats['hits' if hit else 'misses'] += 1
+            return value if hit else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]):
+        self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.default_ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Cached value for key, computing it at most once across concurrent callers
+
+        Args:
+            key: Cache key
+            compute: Zero-arg function that rebuilds the value
+            ttl: Seconds the value stays fresh (defaults to default_ttl)
+
+        Returns:
+            The cached or freshly computed value
+        """
+        with self._lock:
+            hit, value = self._fresh(key)
+            if hit:
+                self.stats['hits'] += 1
+                return value
+            self.stats['misses'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            with self._lock:
+                self.stats['computes'] += 1
+                # A write invalidated the key after compute() may have read the old data
+                if not flight.invalidated:
+                    self._store(key, flight.value, ttl)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self, key: Hashable):
+        """Drop the cached value; a compute already running for the key won't store its result"""
+        with self._lock:
+            self._entries.pop(key, None)
+            flight = self._flights.pop(key, None)
+            if flight is not None:
+                flight.invalidated = True  # Later callers start a fresh compute instead of joining it
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for flight in self._flights.values():
+                flight.invalidated = True
+            self._flights.clear()
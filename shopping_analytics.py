@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Shopping Analytics for Spark Tracker
+Vectorized throughput stats for shop-and-deliver orders:
+items per minute, shop-time share and pay per shopping minute
+Built by SavvyTech Automations
+"""
+
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from trip_record import as_records
+
+
+def shopping_frame(trips: List[Dict]) -> pd.DataFrame:
+    """Per-trip shopping metrics for trips with a recorded shop duration"""
+    df = pd.DataFrame(as_records(trips))
+    if df.empty or 'shop_minutes' not in df:
+        return pd.DataFrame(columns=['date', 'pay', 'shop_minutes', 'shop_items',
+                                     'items_per_min', 'shop_share', 'pay_per_shop_min'])
+
+    df = df[df['shop_minutes'].notna() & (df['shop_minutes'] > 0)].copy()
+    minutes = df['shop_minutes'].astype(float)
+    df['items_per_min'] = df['shop_items'].astype(float) / minutes
+    df['shop_share'] = np.clip(minutes / df['time'].astype(float), 0, 1)
+    df['pay_per_shop_min'] = df['pay'].astype(float) / minutes
+    return df
+
+
+def shopping_summary(trips: List[Dict]) -> Dict:
+    """
+    Are shopping orders worth it?
+
+    Returns:
+        Dict with shopping throughput averages and net $/hr for shop vs. delivery-only trips
+    """
+    df = pd.DataFrame(as_records(trips))
+    shop = shopping_frame(trips)
+    if shop.empty:
+        return {'shop_trips': 0}
+
+    hours = df['time'].astype(float) / 60
+    is_shop = df['shopping'].astype(bool)
+    net = df['net'].astype(float)
+
+    def net_per_hour(mask):
+        return net[mask].sum() / hours[mask].sum() if hours[mask].sum() > 0 else 0.0
+
+    return {
+        'shop_trips': len(shop),
+        'items_per_min': shop['shop_items'].sum() / shop['shop_minutes'].sum(),
+        'shop_share': shop['shop_share'].mean(),
+        'pay_per_shop_min': shop['pay'].sum() / shop['shop_minutes'].sum(),
+        'shop_net_per_hour': net_per_hour(is_shop),
+        'delivery_net_per_hour': net_per_hour(~is_shop)
+    }
@@ -7,8 +7,31 @@ Built by SavvyTech Automations
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
+import struct
+import uuid
 from datetime import datetime, timedelta
+from score_sketch import ScoreSketch
+from earnings_forecast import EarningsForecaster
+from tip_index import TipIndex
+from leaderboards import CommunityLeaderboards
+from fleet import FleetStore
+from report_runner import ReportRunner
+from trip_store import ConnectionPool, SqlTripRepository, DATABASE_URL
+from write_behind import WriteBehindQueue
+from shared_cache import SharedCache
+from what_if import vehicle_grid, what_if_net
+from shopping_analytics import shopping_summary
+from tax_engine import tax_year_summary, schedule_c_rows
+from trip_record import Trip, FingerprintIndex, as_trip, as_records, trip_columns
+from money import format_cents, to_cents_array, from_cents_array
+from fleet import totals_in_dollars
+from entitlements import EntitlementStore, normalize_email
+from checkout_cache import CheckoutSessionCache
+from stripe_integration import SparkPaymentProcessor, get_setting
+from email_auth import send_login_link, verify_login_token
+from coupon_pool import ReferralCodePool
 
 # Page config
 st.set_page_config(
@@ -153,20 +176,194 @@ if 'user_tier' not in st.session_state:
 if 'trips_data' not in st.session_state:
     st.session_state.trips_data = []
 if 'user_email' not in st.session_state:
-    st.session_state.user_email = None
+    st.session_state.user_email = None  # Typed in, unverified; only prefills the sign-in form
+if 'verified_email' not in st.session_state:
+    st.session_state.verified_email = None  # Proven by a magic link, the only way to sign in
 if 'vehicle_config' not in st.session_state:
     st.session_state.vehicle_config = {'type': None, 'engine': None, 'fuel': None}
 if 'current_theme' not in st.session_state:
     st.session_state.current_theme = "Walmart Blue"
 if 'gas_price' not in st.session_state:
     st.session_state.gas_price = 3.50
+if 'score_sketch' not in st.session_state:
+    st.session_state.score_sketch = ScoreSketch()
+if 'last_offer' not in st.session_state:
+    st.session_state.last_offer = None
+if 'forecaster' not in st.session_state:
+    st.session_state.forecaster = EarningsForecaster()
+if 'tip_index' not in st.session_state:
+    st.session_state.tip_index = TipIndex()
+if 'driver_id' not in st.session_state:
+    st.session_state.driver_id = uuid.uuid4().hex
+if 'fleet_id' not in st.session_state:
+    st.session_state.fleet_id = None  # Set only by joining with an invite code
+if 'trip_index' not in st.session_state:
+    st.session_state.trip_index = FingerprintIndex()
+
+# Shared across every session in this server process
+@st.cache_resource
+def get_shared_cache():
+    # Cross-session aggregates: TTL + LRU, one rebuild per expired key
+    return SharedCache(max_entries=512, default_ttl=60)
+
+@st.cache_resource(ttl=300)
+def get_leaderboards():
+    # Rebuilt from the shared store every few minutes, so other workers' saves and imports show up
+    return CommunityLeaderboards(repository=get_trip_store())
+
+@st.cache_resource
+def get_trip_store():
+    # One pool per process, reused across reruns instead of reconnecting
+    return SqlTripRepository(ConnectionPool(DATABASE_URL))
+
+@st.cache_resource
+def get_entitlement_store():
+    # Tier lookups hit the local store via cache; webhooks push invalidations
+    store = EntitlementStore(get_trip_store(), get_shared_cache())
+    store.listen()
+    return store
+
+def resolve_user_tier():
+    """Session tier from the entitlement store (no Stripe API call per page load)"""
+    st.session_state.user_tier = get_entitlement_store().tier_for(st.session_state.verified_email)
+
+@st.cache_resource
+def get_referral_pool():
+    # Referral codes pre-minted in the background, handed out without a Stripe round-trip
+    pool = ReferralCodePool()
+    pool.start()
+    return pool
+
+@st.cache_resource
+def get_payment_processor():
+    processor = SparkPaymentProcessor(referral_pool=get_referral_pool())
+    processor.check_price_amounts()  # Buttons advertise TIER_AMOUNTS; refuse to charge anything else
+    return processor
+
+def plan_price(tier):
+    return f"{format_cents(SparkPaymentProcessor.TIER_AMOUNTS[tier])}/mo"
+
+@st.cache_resource
+def get_checkout_cache():
+    # Open checkout sessions reused per (email, tier); new ones rate-limited per user
+    return CheckoutSessionCache(get_payment_processor(), get_shared_cache())
+
+def start_checkout(tier):
+    """Show a checkout link for the tier, reusing the user's open session"""
+    # Checkout is bound to the signed-in email, so the plan lands on an address the payer proved
+    if not st.session_state.verified_email:
+        st.warning("Sign in with the emailed link to upgrade")
+        return
+    result = get_checkout_cache().get_checkout(st.session_state.verified_email, tier)
+    if result['success']:
+        st.link_button("💳 Complete payment", result['checkout_url'])
+    else:
+        st.error(f"Error: {result['error']}")
+
+@st.cache_resource
+def get_write_queue():
+    # Saves land in an in-memory journal; a background thread group-commits them
+    return WriteBehindQueue(get_trip_store())
+
+def load_driver_history(driver_id):
+    """Pull a driver's trips from the shared store and rebuild per-session models"""
+    # Journaled rows (e.g. a fresh CSV import) come in file order; the forecaster needs date order
+    trips = sorted((as_trip(t) for t in get_write_queue().read_trips(driver_id)), key=lambda t: t['date'])
+    forecaster = EarningsForecaster()
+    tip_index = TipIndex()
+    for trip in trips:
+        if trip.get('address'):
+            tip_index.record(trip['address'], trip.get('tip'))
+        try:
+            forecaster.add_trip(datetime.fromisoformat(trip['date']).date(), trip['net'])
+        except ValueError:
+            continue  # Non-ISO date saved before imports were validated; don't lock the driver out
+    sketch = get_trip_store().get_driver_state(driver_id, 'score_sketch')
+    st.session_state.trips_data = trips
+    st.session_state.trip_index = FingerprintIndex(trips)
+    st.session_state.forecaster = forecaster
+    st.session_state.tip_index = tip_index
+    st.session_state.score_sketch = ScoreSketch.from_dict(sketch) if sketch else ScoreSketch()
+    st.session_state.last_offer = None
+
+def record_offer(offer):
+    """Add a rated offer (pay, miles, time, stops) to the driver's score sketch once"""
+    if offer == st.session_state.last_offer:
+        return
+    st.session_state.last_offer = offer
+    sketch = st.session_state.score_sketch
+    sketch.update(calculate_trip_score(*offer))
+    if st.session_state.verified_email:
+        get_trip_store().set_driver_state(st.session_state.verified_email, 'score_sketch', sketch.to_dict())
+
+def current_driver_id():
+    return st.session_state.verified_email or st.session_state.driver_id
+
+def current_fleet():
+    """The Fleet Master's own fleet, or the one this driver joined with an invite code"""
+    if st.session_state.user_tier == 'fleet' and st.session_state.verified_email:
+        return FleetStore.for_owner(st.session_state.verified_email)
+    if st.session_state.fleet_id:
+        return FleetStore(st.session_state.fleet_id)
+    return None
+
+def add_to_fleet(trips):
+    """Copy the driver's new trips into their fleet's partition, if they're in one"""
+    fleet = current_fleet()
+    if fleet and fleet.is_member(current_driver_id()):
+        fleet.add_trips(current_driver_id(), trips)
+
+def sign_in(email):
+    """Switch the session to a verified email, carrying over trips logged anonymously"""
+    email = normalize_email(email)
+    anonymous_id = st.session_state.driver_id
+    if current_driver_id() == anonymous_id:
+        queue = get_write_queue()
+        if not queue.flush():
+            # Storage is behind; journal the unsaved trips under the email as well
+            for trip in queue.pending(anonymous_id):
+                queue.enqueue(email, trip)
+        get_trip_store().move_trips(anonymous_id, email)
+        if get_trip_store().get_driver_state(email, 'score_sketch') is None:
+            # First sign-in keeps the offers rated so far
+            get_trip_store().set_driver_state(email, 'score_sketch', st.session_state.score_sketch.to_dict())
+    st.session_state.verified_email = email
+    st.session_state.user_email = email
+    membership = get_trip_store().get_driver_state(email, 'fleet')
+    st.session_state.fleet_id = membership['fleet_id'] if membership else None  # Joined in an earlier session
+    load_driver_history(email)
+
+def verify_identity_from_url():
+    """Sign in from a magic link, or refresh the tier after checkout, then drop the params"""
+    params = st.query_params
+    if params.get('login'):
+        email = verify_login_token(params['login'], get_trip_store())
+        if email:
+            sign_in(email)
+        else:
+            st.error("❌ Sign-in link is invalid, expired or already used")
+    elif params.get('payment_success'):
+        # The redirect proves nothing about identity; it only refreshes an already signed-in session
+        email = st.session_state.verified_email
+        if email:
+            get_entitlement_store().invalidate(email)  # Just paid, don't serve a cached 'free'
+            get_checkout_cache().invalidate(email)
+        else:
+            st.info("✅ Payment received - sign in with the emailed link to use your plan")
+    else:
+        return
+    params.clear()  # Tokens don't linger in the URL
 
 # Get available themes based on tier
 def get_available_themes():
+    tier = st.session_state.user_tier
+    return get_shared_cache().get_or_compute(('themes', tier), lambda: themes_for_tier(tier), ttl=3600)
+
+def themes_for_tier(tier):
     all_themes = list(COLOR_THEMES.keys())
-    if st.session_state.user_tier == 'free':
+    if tier == 'free':
         return all_themes[:5]
-    elif st.session_state.user_tier == 'basic':
+    elif tier == 'basic':
         return all_themes[:15]
     else:  # pro
         return all_themes
@@ -275,6 +472,17 @@ VEHICLE_MPG = {
     ('Hybrid', 'Hybrid', 'Hybrid'): 50,
 }
 
+@st.cache_data
+def build_what_if_heatmap(pays, miles, price_min, price_max, price_step):
+    gas_prices = np.round(np.arange(price_min, price_max + price_step / 2, price_step), 2)
+    labels, mpg = vehicle_grid(VEHICLE_MPG)
+    net = what_if_net(pays, miles, gas_prices, mpg)
+    fig = px.imshow(
+        net, x=labels, y=[f"${p:.2f}" for p in gas_prices], aspect="auto",
+        color_continuous_scale="RdYlGn", labels={'x': 'Vehicle', 'y': 'Gas Price', 'color': 'Net ($)'}
+    )
+    return fig, net, gas_prices, labels
+
 def calculate_mpg(vehicle_type, engine_type, fuel_type):
     key = (vehicle_type, engine_type, fuel_type)
     if key in VEHICLE_MPG:
@@ -291,15 +499,30 @@ def calculate_mpg(vehicle_type, engine_type, fuel_type):
         return 18
     return 25
 
-def calculate_trip_rating(pay, miles, time_minutes, stops):
+# Personalized rating: percentile cutoffs within the driver's own offers
+RATING_PERCENTILES = {'excellent': 0.75, 'good': 0.40}
+MIN_SKETCH_OFFERS = 20  # Use fixed cutoffs until we've seen enough offers
+
+def calculate_trip_score(pay, miles, time_minutes, stops):
     pay_per_mile = pay / (miles * 2) if miles > 0 else 0
     pay_per_hour = (pay / time_minutes * 60) if time_minutes > 0 else 0
     pay_per_stop = pay / stops if stops > 0 else 0
-    score = (pay_per_mile * 10) + (pay_per_hour * 0.5) + (pay_per_stop * 2)
+    return (pay_per_mile * 10) + (pay_per_hour * 0.5) + (pay_per_stop * 2)
+
+def calculate_trip_rating(pay, miles, time_minutes, stops, sketch=None):
+    score = calculate_trip_score(pay, miles, time_minutes, stops)
+
+    if sketch is not None and sketch.n >= MIN_SKETCH_OFFERS:
+        percentile = sketch.rank(score)
+        is_excellent = percentile >= RATING_PERCENTILES['excellent']
+        is_good = percentile >= RATING_PERCENTILES['good']
+    else:
+        is_excellent = score >= 30
+        is_good = score >= 15
 
-    if score >= 30:
+    if is_excellent:
         return "excellent", "🔥 EXCELLENT DEAL! 🔥", "excellent-deal"
-    elif score >= 15:
+    elif is_good:
         return "good", "👍 Good Deal", "good-deal"
     else:
         return "shit", "💩 Shit Deal - Decline!", "shit-deal"
@@ -322,6 +545,9 @@ def calculate_net_earnings(gross_pay, miles, vehicle_config, gas_price):
     }
 
 def main():
+    verify_identity_from_url()
+    resolve_user_tier()
+
     # Theme Selector at Top
     with st.container():
         col1, col2, col3 = st.columns([2, 3, 2])
@@ -347,7 +573,9 @@ def main():
         st.markdown('<div class="main-header">⚡ Spark</div>', unsafe_allow_html=True)
 
         # Tier Badge
-        if st.session_state.user_tier == 'pro':
+        if st.session_state.user_tier == 'fleet':
+            st.success("🚚 FLEET MASTER")
+        elif st.session_state.user_tier == 'pro':
             st.success("💎 PRO USER")
         elif st.session_state.user_tier == 'basic':
             st.info("⭐ BASIC USER")
@@ -356,19 +584,27 @@ def main():
 
         st.markdown("---")
 
-        # Email capture
-        if not st.session_state.user_email:
-            st.subheader("📧 Get Started")
-            email = st.text_input("Email", placeholder="driver@example.com")
-            if st.button("Save Email"):
+        # Email sign-in (tier and saved trips only unlock for a verified address)
+        if not st.session_state.verified_email:
+            st.subheader("📧 Sign In")
+            email = st.text_input("Email", value=st.session_state.user_email or "",
+                                  placeholder="driver@example.com")
+            if st.button("Email Me a Sign-In Link"):
                 if email and '@' in email:
                     st.session_state.user_email = email
-                    st.success("✅ Saved!")
-                    st.rerun()
+                    app_url = get_setting("STREAMLIT_APP_URL") or "https://spark-tracker-pro.streamlit.app"
+                    result = send_login_link(email, app_url)
+                    if result['success']:
+                        st.success("✅ Check your inbox for the sign-in link")
+                    else:
+                        st.error(f"Error: {result['error']}")
 
         # Navigation
         st.subheader("📊 Navigation")
-        page = st.radio("", ["Log Trip", "Dashboard", "AI Insights", "Reports", "Community", "Settings"],
+        pages = ["Log Trip", "Dashboard", "AI Insights", "Reports", "Community", "Settings"]
+        if st.session_state.user_tier == 'fleet':
+            pages.insert(4, "Fleet")
+        page = st.radio("", pages,
                        label_visibility="collapsed")
 
         st.markdown("---")
@@ -379,16 +615,16 @@ def main():
             st.info(f"**Trips:** {trips_count}/10 per week")
             st.info("**Data:** 7 days")
             st.info("**Themes:** 5 colors")
-            if st.button("⚡ Upgrade to Basic - $5.99/mo"):
-                st.info("Coming soon!")
-            if st.button("💎 Upgrade to Pro - $9.99/mo"):
-                st.info("Coming soon!")
+            if st.button(f"⚡ Upgrade to Basic - {plan_price('basic')}"):
+                start_checkout('basic')
+            if st.button(f"💎 Upgrade to Pro - {plan_price('pro')}"):
+                start_checkout('pro')
         elif st.session_state.user_tier == 'basic':
             st.success("**Unlimited trips**")
             st.success("**Data:** 1.5 years")
             st.success("**Themes:** 15 colors")
-            if st.button("💎 Upgrade to Pro - $9.99/mo"):
-                st.info("Coming soon!")
+            if st.button(f"💎 Upgrade to Pro - {plan_price('pro')}"):
+                start_checkout('pro')
 
     # Route to pages
     if page == "Log Trip":
@@ -399,6 +635,8 @@ def main():
         show_ai_insights()
     elif page == "Reports":
         show_reports()
+    elif page == "Fleet":
+        show_fleet()
     elif page == "Community":
         show_community()
     elif page == "Settings":
@@ -455,6 +693,20 @@ def show_log_trip():
         trip_stops = st.number_input("Stops", min_value=1, value=3, step=1)
         st.caption(f"Walmart + {trip_stops - 1}")
 
+    # Optional drop-off / customer tag for tip tracking
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        trip_address = st.text_input("📍 Drop-off Address or Customer Tag (optional)", placeholder="123 Main St")
+    with col2:
+        trip_tip = st.number_input("Tip ($)", min_value=0.0, value=None, step=0.50,
+                                   placeholder="Not tipped yet")  # Blank stays missing, not $0
+
+    tip_stats = st.session_state.tip_index.lookup(trip_address)
+    if st.session_state.tip_index.is_flagged(tip_stats):
+        st.warning(f"⚠️ {tip_stats['label']} cut the tip {tip_stats['streak']}x in a row (avg ${tip_stats['avg_tip']:.2f})")
+    elif tip_stats and tip_stats['tipped']:
+        st.caption(f"💵 Avg tip here: ${tip_stats['avg_tip']:.2f} over {tip_stats['tipped']} tipped trips")
+
     # Manual Gas Price
     st.markdown("### ⛽ Fuel Cost (Edit if needed)")
     st.session_state.gas_price = st.number_input(
@@ -467,9 +719,18 @@ def show_log_trip():
 
     # Calculate Rating
     if trip_pay > 0 and trip_miles > 0:
-        rating_type, rating_text, rating_class = calculate_trip_rating(trip_pay, trip_miles, trip_time, trip_stops)
+        sketch = st.session_state.score_sketch
+        rating_type, rating_text, rating_class = calculate_trip_rating(trip_pay, trip_miles, trip_time, trip_stops, sketch)
         st.markdown(f'<div class="deal-rating {rating_class}">{rating_text}</div>', unsafe_allow_html=True)
 
+        # Offers enter the driver's score sketch on an explicit rate or on save, never while typing
+        offer = (trip_pay, trip_miles, trip_time, trip_stops)
+        if sketch.n >= MIN_SKETCH_OFFERS:
+            st.caption(f"📊 Better than {sketch.rank(calculate_trip_score(*offer)) * 100:.0f}% of your {sketch.n} offers")
+        if st.button("📥 Rate Offer", help="Count this offer in your deal ratings without saving a trip"):
+            record_offer(offer)
+            st.success("✅ Offer rated")
+
         earnings = calculate_net_earnings(trip_pay, trip_miles, st.session_state.vehicle_config, st.session_state.gas_price)
 
         col1, col2, col3, col4 = st.columns(4)
@@ -486,6 +747,7 @@ def show_log_trip():
 
     # Shopping & Incentives
     shopping = st.checkbox("🛒 Shopping Required")
+    shop_start = shop_end = shop_minutes = shop_items = None
     if shopping:
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -497,7 +759,10 @@ def show_log_trip():
 
         if shop_start and shop_end:
             duration = (datetime.combine(datetime.today(), shop_end) - datetime.combine(datetime.today(), shop_start)).total_seconds() / 60
-            st.info(f"⏱️ Duration: {int(duration)} min")
+            if duration < 0:
+                duration += 24 * 60  # Shop ran past midnight
+            shop_minutes = duration
+            st.info(f"⏱️ Duration: {int(duration)} min · {shop_items / duration if duration else 0:.1f} items/min")
 
     incentives = st.checkbox("🎯 Working Toward Incentive")
     if incentives:
@@ -519,14 +784,29 @@ def show_log_trip():
         trip_notes = st.text_area("Notes", height=100)
 
     if st.button("💾 Save Trip", type="primary", use_container_width=True):
-        trip_data = {
-            'date': trip_date.isoformat(), 'pay': trip_pay, 'miles': trip_miles,
-            'time': trip_time, 'stops': trip_stops,
-            'net': earnings['net'] if trip_pay > 0 else 0,
-            'rating': rating_type if trip_pay > 0 else 'unknown',
-            'vehicle': vehicle_type, 'shopping': shopping, 'incentive': incentives, 'notes': trip_notes
-        }
+        trip_data = Trip(
+            date=trip_date.isoformat(), pay=trip_pay, miles=trip_miles,
+            time=trip_time, stops=trip_stops,
+            net=earnings['net'] if trip_pay > 0 else 0,
+            rating=rating_type if trip_pay > 0 else 'unknown',
+            vehicle=vehicle_type, shopping=shopping, incentive=incentives, notes=trip_notes,
+            address=trip_address.strip() or None, tip=trip_tip,
+            shop_start=shop_start.strftime('%H:%M') if shop_start else None,
+            shop_end=shop_end.strftime('%H:%M') if shop_end else None,
+            shop_minutes=shop_minutes, shop_items=shop_items
+        )
+        if not st.session_state.trip_index.add(trip_data):
+            st.info("✅ Already saved - this trip is in your log")
+            return
+        get_write_queue().enqueue(current_driver_id(), trip_data)
+        if trip_pay > 0 and trip_miles > 0:
+            record_offer((trip_pay, trip_miles, trip_time, trip_stops))
         st.session_state.trips_data.append(trip_data)
+        st.session_state.forecaster.add_trip(trip_date, trip_data['net'])
+        if trip_data['address']:
+            st.session_state.tip_index.record(trip_data['address'], trip_tip)
+        get_leaderboards().record_trip(current_driver_id(), trip_data)
+        add_to_fleet([trip_data])
         st.success(f"✅ Saved! Total: {len(st.session_state.trips_data)}")
         st.balloons()
 
@@ -537,23 +817,72 @@ def show_dashboard():
         st.info("No trips yet! Go to 'Log Trip' to start.")
         return
 
-    total_gross = sum(t['pay'] for t in st.session_state.trips_data)
-    total_net = sum(t['net'] for t in st.session_state.trips_data)
-    total_trips = len(st.session_state.trips_data)
-    avg_per_trip = total_net / total_trips if total_trips > 0 else 0
+    # Exact integer-cent totals (no float drift over thousands of trips), one bulk decode
+    columns = trip_columns(st.session_state.trips_data)
+    total_trips = len(columns)
+    total_gross = int(columns['pay_cents'].sum())
+    total_net = int(columns['net_cents'].sum())
+    avg_per_trip = total_net // total_trips if total_trips > 0 else 0
 
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Gross", f"${total_gross:.2f}")
+        st.metric("Gross", format_cents(total_gross))
     with col2:
-        st.metric("Net", f"${total_net:.2f}", f"-${total_gross - total_net:.2f}")
+        st.metric("Net", format_cents(total_net), format_cents(total_net - total_gross))
     with col3:
         st.metric("Trips", total_trips)
     with col4:
-        st.metric("Avg/Trip", f"${avg_per_trip:.2f}")
+        st.metric("Avg/Trip", format_cents(avg_per_trip))
+
+    # Forecast (incremental Holt-Winters, updated on every save)
+    forecaster = st.session_state.forecaster
+    week = forecaster.week_forecast()
+    month = forecaster.month_forecast()
+    st.subheader("🔮 Forecast")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("This Week", f"${week['expected']:.0f}", f"${week['low']:.0f} - ${week['high']:.0f}", delta_color="off")
+    with col2:
+        st.metric("This Month", f"${month['expected']:.0f}", f"${month['low']:.0f} - ${month['high']:.0f}", delta_color="off")
+    if forecaster.days_seen < 14:
+        st.caption("📈 Forecast sharpens after two weeks of trips")
+
+    # What-if: whole history re-priced for every gas price x vehicle
+    with st.expander("⛽ Gas Price What-If"):
+        col1, col2 = st.columns(2)
+        with col1:
+            price_min, price_max = st.slider("Gas price range ($/gal)", 2.0, 8.0, (2.50, 6.00), 0.25)
+        with col2:
+            price_step = st.select_slider("Step", [0.10, 0.25, 0.50], value=0.25)
+        pays = tuple(from_cents_array(columns['pay_cents']).tolist())
+        miles = tuple(columns['miles'].tolist())
+        fig, net, gas_prices, labels = build_what_if_heatmap(pays, miles, price_min, price_max, price_step)
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Would a hybrid pay off at today's gas price?
+        row = int(np.abs(gas_prices - st.session_state.gas_price).argmin())
+        config = st.session_state.vehicle_config
+        current_mpg = calculate_mpg(config.get('type') or 'Sedan', config.get('engine') or 'V6', config.get('fuel') or 'Gas')
+        current_net = what_if_net(pays, miles, gas_prices[row:row + 1], np.array([current_mpg]))[0, 0]
+        hybrid_net = net[row, labels.index("Hybrid")]
+        st.info(f"🔌 At ${gas_prices[row]:.2f}/gal a Hybrid would have netted ${hybrid_net - current_net:+.2f} vs your current vehicle")
+
+    shop = shopping_summary(st.session_state.trips_data)
+    if shop['shop_trips']:
+        st.subheader("🛒 Shopping Orders")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Items/Min", f"{shop['items_per_min']:.1f}")
+        with col2:
+            st.metric("Shop Time Share", f"{shop['shop_share'] * 100:.0f}%")
+        with col3:
+            st.metric("$/Shop Min", f"${shop['pay_per_shop_min']:.2f}")
+        with col4:
+            st.metric("Net/Hr (Shop)", f"${shop['shop_net_per_hour']:.2f}",
+                      f"${shop['shop_net_per_hour'] - shop['delivery_net_per_hour']:+.2f} vs delivery only")
 
     st.subheader("🚗 Recent Trips")
-    df = pd.DataFrame(st.session_state.trips_data)
+    df = pd.DataFrame(as_records(st.session_state.trips_data))
     st.dataframe(df[['date', 'pay', 'net', 'miles', 'rating']].tail(10), use_container_width=True)
 
 def show_ai_insights():
@@ -571,31 +900,265 @@ def show_ai_insights():
         st.subheader("💡 Your Insights")
         st.info("⏰ Best time: Saturday 3-6 PM (+35%)")
         st.info("📍 Downtown pays 20% more")
-        st.warning("⚠️ Customer at 123 Main reduced tip 3x")
+        flagged = st.session_state.tip_index.flagged()
+        for entry in flagged[:5]:
+            st.warning(f"⚠️ {entry['label']} cut the tip {entry['streak']}x in a row")
+        if not flagged:
+            st.info("💵 No repeat tip reducers yet")
+        if st.session_state.trips_data:
+            week = st.session_state.forecaster.week_forecast()
+            st.success(f"🎯 On track for ${week['expected']:.0f} this week!")
 
 def show_reports():
     st.markdown('<div class="main-header">📈 Reports</div>', unsafe_allow_html=True)
 
-    if st.session_state.user_tier != 'pro':
+    if st.session_state.user_tier not in ('pro', 'fleet'):
         st.warning("🔒 Reports require Pro!")
         return
 
-    st.info("💼 Tax export ready")
-    if st.button("📥 Download CSV"):
-        st.success("Downloaded!")
+    st.subheader("💼 Tax Summary")
+    tax_year = st.selectbox("Tax Year", list(range(datetime.now().year, datetime.now().year - 5, -1)))
+    method = st.radio("Vehicle deduction method", ['standard', 'actual'], horizontal=True,
+                      format_func=lambda m: "Standard mileage" if m == 'standard' else "Actual cost (estimate)",
+                      help="Actual cost here is tracked gas plus an assumed $0.10/mi wear; "
+                           "use your receipts before electing it")
+    summary = tax_year_summary(st.session_state.trips_data, tax_year, method)
+    if not summary['trips']:
+        st.info(f"No trips logged for {tax_year}.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Business Miles", f"{summary['business_miles']:,.1f}")
+    with col2:
+        st.metric("Gross Receipts", f"${summary['line_1_gross_receipts']:,.2f}")
+    with col3:
+        st.metric("Vehicle Deduction", f"${summary['line_9_car_and_truck']:,.2f}",
+                  "Standard" if method == 'standard' else "Actual (estimate)", delta_color="off")
+    with col4:
+        st.metric("Net Profit", f"${summary['line_31_net_profit']:,.2f}")
+
+    rates = " / ".join(f"${rate:.3f}" for rate in summary['mileage_rates'])
+    st.caption(f"Standard mileage @ {rates}/mi by trip date: ${summary['standard_deduction']:,.2f} · "
+               f"Actual cost estimate (gas + assumed $0.10/mi wear): ${summary['actual_deduction_estimate']:,.2f}")
+    schedule = pd.DataFrame(schedule_c_rows(summary))
+    st.dataframe(schedule, use_container_width=True, hide_index=True)
+
+    year_trips = pd.DataFrame(as_records(t for t in st.session_state.trips_data if t['date'].startswith(f"{tax_year}-")))
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("📥 Download Schedule C CSV", schedule.to_csv(index=False),
+                           file_name=f"spark_schedule_c_{tax_year}.csv", mime="text/csv")
+    with col2:
+        st.download_button("📥 Download Trips CSV", year_trips.to_csv(index=False),
+                           file_name=f"spark_trips_{tax_year}.csv", mime="text/csv")
+
+def show_fleet():
+    st.markdown('<div class="main-header">🚚 Fleet</div>', unsafe_allow_html=True)
+
+    if st.session_state.user_tier != 'fleet':
+        st.warning("🔒 Fleet analytics require Fleet Master!")
+        return
+    if not st.session_state.verified_email:
+        st.info("Sign in to see your fleet.")
+        return
+
+    # Only the owner's own fleet is readable; merged from per-driver partition summaries
+    store = current_fleet()
+    result = get_shared_cache().get_or_compute(
+        ('fleet_summary', store.fleet_id), store.fleet_summary, ttl=60
+    )
+    fleet = result['fleet']
+    if not result['per_driver']:
+        st.info(f"No driver trips in this fleet yet. Share your invite code: `{store.invite()}`")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Drivers", len(result['per_driver']))
+    with col2:
+        st.metric("Trips", fleet.totals['trips'])
+    with col3:
+        st.metric("Gross", format_cents(fleet.totals['gross_cents']))
+    with col4:
+        st.metric("Net", format_cents(fleet.totals['net_cents']))
+
+    def dollars_frame(groups):
+        return pd.DataFrame.from_dict({k: totals_in_dollars(v) for k, v in groups.items()}, orient='index')
+
+    st.subheader("👥 Per Driver")
+    st.dataframe(dollars_frame(result['per_driver']), use_container_width=True)
+
+    st.subheader("🚗 Per Vehicle")
+    st.dataframe(dollars_frame(fleet.by_vehicle), use_container_width=True)
+
+    st.subheader("📅 Per Day")
+    by_day = dollars_frame(fleet.by_day).sort_index()
+    st.plotly_chart(px.bar(by_day, y='net', labels={'index': 'Date', 'net': 'Net ($)'}), use_container_width=True)
+
+    st.subheader("📑 Driver Reports")
+    report_year = st.number_input("Year", min_value=2020, max_value=2100, value=datetime.now().year)
+    if st.button("📊 Generate Driver Reports"):
+        # Per-driver aggregation runs on a process pool; rows appear as each driver finishes
+        runner = ReportRunner(store)
+        rows = []
+        table = st.empty()
+        for partial in runner.iter_reports(year=int(report_year)):
+            rows.append(dict(driver=partial['driver_id'], **partial['report']))
+            table.dataframe(pd.DataFrame(rows), use_container_width=True)
+        st.success(f"✅ {len(rows)} reports - fleet net {format_cents(runner.merged.totals['net_cents'])}")
 
 def show_community():
     st.markdown('<div class="main-header">💬 Community</div>', unsafe_allow_html=True)
 
     st.subheader("🏆 This Week's Awards")
-    st.success("💩 Shittiest Trip: $8 for 45mi")
-    st.success("💰 Best Tip: $50 cash!")
+    week = CommunityLeaderboards.week_key(datetime.now().date())
+    board = get_shared_cache().get_or_compute(('community', week), lambda: get_leaderboards().snapshot(), ttl=30)
+    if not board['top_weekly_net']:
+        st.info("No trips logged this week yet - be the first!")
+        return
+
+    for trip in board['worst_pay_per_mile'][:1]:
+        st.success(f"💩 Shittiest Trip: ${trip['pay']:.0f} for {trip['miles']:.0f}mi - {trip['driver']}")
+    for trip in board['best_tip'][:1]:
+        st.success(f"💰 Best Tip: ${trip['tip']:.0f} - {trip['driver']}")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("**💩 Worst $/Mile**")
+        for trip in board['worst_pay_per_mile']:
+            st.caption(f"${trip['pay_per_mile']:.2f}/mi - {trip['driver']}")
+    with col2:
+        st.markdown("**💰 Best Tips**")
+        for trip in board['best_tip']:
+            st.caption(f"${trip['tip']:.2f} - {trip['driver']}")
+    with col3:
+        st.markdown("**🏁 Top Weekly Net**")
+        for row in board['top_weekly_net']:
+            st.caption(f"${row['net']:.2f} - {row['driver']}")
+
+IMPORT_REQUIRED = ('date', 'pay', 'miles', 'time', 'stops')
+IMPORT_NUMBERS = ('pay', 'miles', 'time', 'stops', 'net', 'tip', 'shop_minutes', 'shop_items')
+
+def parse_trip_date(value):
+    """ISO date string for a CSV date cell (YYYY-MM-DD, or US MM/DD/YYYY); raises ValueError"""
+    text = str(value).strip()
+    try:
+        return datetime.fromisoformat(text).date().isoformat()
+    except ValueError:
+        return datetime.strptime(text, '%m/%d/%Y').date().isoformat()
+
+def clean_import_row(row):
+    """Normalize a CSV row in place before it becomes a Trip; returns why it's rejected, or None"""
+    for field in IMPORT_REQUIRED:
+        if row.get(field) is None:
+            return f"{field} is blank"
+    try:
+        row['date'] = parse_trip_date(row['date'])
+    except ValueError:
+        return f"date {row['date']!r} isn't YYYY-MM-DD"
+    for field in IMPORT_NUMBERS:
+        if row.get(field) is None:
+            continue
+        try:
+            value = float(row[field])
+        except (TypeError, ValueError):
+            return f"{field} {row[field]!r} isn't a number"
+        # Net can go negative (gas > pay); nothing else can
+        if not np.isfinite(value) or (value < 0 and field != 'net'):
+            return f"{field} must be 0 or more"
+        row[field] = value
+    return None
+
+def import_trips_csv(uploaded):
+    """Bulk-load a CSV; invalid rows are reported, rows already in the log are skipped by fingerprint"""
+    df = pd.read_csv(uploaded)
+    missing = set(IMPORT_REQUIRED) - set(df.columns)
+    if missing:
+        st.error(f"❌ Missing columns: {', '.join(sorted(missing))}")
+        return
+
+    df = df.astype(object).where(df.notna(), None)
+    rows, rejected = [], []
+    for line, row in enumerate(df.to_dict('records'), start=2):  # Line 1 is the header
+        error = clean_import_row(row)
+        if error:
+            rejected.append(f"line {line}: {error}")
+            continue
+        if row.get('net') is None:
+            row['net'] = calculate_net_earnings(row['pay'], row['miles'], st.session_state.vehicle_config,
+                                                st.session_state.gas_price)['net']
+        rows.append((line, row))
+
+    # Dollars -> cents for the whole file at once; Trips are built from cents
+    money = {f"{field}_cents": to_cents_array([row.pop(field) for _, row in rows]) for field in ('pay', 'net')}
+    trips = []
+    for i, (line, row) in enumerate(rows):  # A blank tip cell stays None (not tipped)
+        try:
+            trips.append(Trip.from_dict(dict(row, **{name: int(cents[i]) for name, cents in money.items()})))
+        except (TypeError, ValueError, struct.error):
+            rejected.append(f"line {line}: value out of range")
+
+    if rejected:
+        st.warning(f"⚠️ Skipped {len(rejected)} invalid rows: " + "; ".join(rejected[:10])
+                   + (" ..." if len(rejected) > 10 else ""))
+    if not trips:
+        st.error("❌ No valid trips to import")
+        return
+
+    new_trips = st.session_state.trip_index.upsert_many(trips)
+    queue = get_write_queue()
+    for trip in new_trips:
+        queue.enqueue(current_driver_id(), trip)
+    if new_trips:
+        add_to_fleet(new_trips)
+    load_driver_history(current_driver_id())
+    st.success(f"✅ Imported {len(new_trips)} trips · skipped {len(trips) - len(new_trips)} duplicates")
 
 def show_settings():
     st.markdown('<div class="main-header">⚙️ Settings</div>', unsafe_allow_html=True)
 
-    if st.session_state.user_email:
-        st.info(f"📧 {st.session_state.user_email}")
+    if st.session_state.verified_email:
+        st.info(f"📧 {st.session_state.verified_email}")
+    elif st.session_state.user_email:
+        st.info(f"📧 {st.session_state.user_email} (not verified, open the emailed link to sign in)")
+
+    st.subheader("🚚 Fleet")
+    if not st.session_state.verified_email:
+        st.caption("Sign in to join a fleet")
+    elif st.session_state.user_tier == 'fleet':
+        st.code(current_fleet().invite())
+        st.caption("Share this invite code with your drivers so their trips land in your fleet")
+    else:
+        invite = st.text_input("Fleet invite code", help="Ask your Fleet Master for it")
+        if st.button("Join Fleet"):
+            fleet = FleetStore.join(invite, current_driver_id())
+            if fleet:
+                st.session_state.fleet_id = fleet.fleet_id
+                # Remembered per driver so later sessions keep saving to the fleet
+                get_trip_store().set_driver_state(current_driver_id(), 'fleet', {'fleet_id': fleet.fleet_id})
+                st.success("✅ Joined!")
+            else:
+                st.error("❌ Invalid invite code")
+
+    st.subheader("🎁 Refer a Driver")
+    if not st.session_state.verified_email:
+        st.caption("Sign in to get a referral code")
+    elif st.session_state.get('referral_code'):
+        st.code(st.session_state.referral_code)
+        st.caption("Your friend gets 20% off their first month at checkout")
+    elif st.button("Get Referral Code"):
+        result = get_payment_processor().create_referral_coupon(current_driver_id())
+        if result['success']:
+            st.session_state.referral_code = result['coupon_code']
+            st.rerun()
+        else:
+            st.error(f"Error: {result['error']}")
+
+    st.subheader("📤 Import Trips")
+    uploaded = st.file_uploader("Trips CSV (date, pay, miles, time, stops)", type="csv")
+    if uploaded and st.button("Import"):
+        import_trips_csv(uploaded)
 
     st.subheader("🎨 Theme Preview")
     st.info(f"Current: {st.session_state.current_theme}")
@@ -5,23 +5,65 @@ Handles $12/mo Pro subscriptions with webhook processing
 Built by Chlo - SavvyTech Automations
 """
 
+import hashlib
+import hmac
+import logging
 import os
 import stripe
 import json
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+from coupon_pool import ReferralCodePool
+from payment_logging import get_payment_logger, log_event
 
 # Initialize Stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY", "sk_test_demo_key_replace_with_real")
 
+# Price IDs printed by setup_stripe.py (env var or Streamlit secrets)
+PRICE_ID_SETTINGS = {'basic': 'BASIC_PRICE_ID', 'pro': 'PRO_PRICE_ID'}
+
+
+def get_setting(name: str) -> Optional[str]:
+    """Config value from the environment, falling back to Streamlit secrets"""
+    value = os.getenv(name)
+    if value:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets.get(name)
+    except Exception:
+        return None  # Not running under Streamlit, or no secrets.toml
+
+
+def load_price_ids() -> Dict[str, str]:
+    """Tier -> Stripe Price ID for every tier that has one configured"""
+    price_ids = {}
+    for tier, name in PRICE_ID_SETTINGS.items():
+        value = get_setting(name)
+        if value and not value.lower().startswith('price_your'):  # Template placeholder
+            price_ids[tier] = value
+    return price_ids
+
+
 class SparkPaymentProcessor:
     """Handles all Stripe payment operations for Spark Tracker"""
 
     PRICE_BASIC_MONTHLY = 699   # $6.99 in cents
     PRICE_PRO_MONTHLY = 999     # $9.99 in cents
+    TIER_AMOUNTS = {'basic': PRICE_BASIC_MONTHLY, 'pro': PRICE_PRO_MONTHLY}
 
-    def __init__(self):
+    def __init__(self, idempotency=None, entitlements=None, price_ids: Optional[Dict[str, str]] = None,
+                 referral_pool=None):
         self.currency = "usd"
+        # Loaded once; checkout then only sends a price reference
+        self.price_ids = load_price_ids() if price_ids is None else price_ids
+        self.idempotency = idempotency  # Optional EventIdempotency; dedupes Stripe retries
+        self.entitlements = entitlements  # Optional EntitlementStore the handlers write to
+        self.logger = get_payment_logger()  # Queue-backed, never blocks on I/O
+        self.referral_pool = referral_pool  # Optional ReferralCodePool of pre-minted codes
 
     def create_checkout_session(
         self,
@@ -43,39 +85,18 @@ class SparkPaymentProcessor:
             Dict with checkout session URL and session ID
         """
         try:
-            # Determine price based on tier
-            if tier == "basic":
-                price = self.PRICE_BASIC_MONTHLY
-                tier_name = "Basic"
-                tier_features = "Unlimited trips, 15 themes, voice commands"
-            else:  # pro
-                price = self.PRICE_PRO_MONTHLY
-                tier_name = "Pro"
-                tier_features = "Everything + 30 themes, AI assistant, screen capture"
-
             # Create Checkout Session
             session = stripe.checkout.Session.create(
                 payment_method_types=['card'],
-                line_items=[{
-                    'price_data': {
-                        'currency': self.currency,
-                        'product_data': {
-                            'name': f'Spark Tracker {tier_name}',
-                            'description': tier_features,
-                        },
-                        'unit_amount': price,
-                        'recurring': {
-                            'interval': 'month',
-                        },
-                    },
-                    'quantity': 1,
-                }],
+                line_items=[self._line_item(tier)],
                 mode='subscription',
                 success_url=success_url + f'&tier={tier}&session_id={{CHECKOUT_SESSION_ID}}',
                 cancel_url=cancel_url,
                 customer_email=customer_email,
                 allow_promotion_codes=True,  # Enable discount codes
                 billing_address_collection='auto',
+                # Copied onto the subscription so reconcile.py can read the tier of an inline price
+                subscription_data={'metadata': {'tier': tier}},
                 metadata={
                     'tier': tier,
                     'product': 'spark_tracker',
@@ -86,7 +107,8 @@ class SparkPaymentProcessor:
             return {
                 'success': True,
                 'checkout_url': session.url,
-                'session_id': session.id
+                'session_id': session.id,
+                'expires_at': session.expires_at
             }
 
         except stripe.error.StripeError as e:
@@ -95,6 +117,57 @@ class SparkPaymentProcessor:
                 'error': str(e)
             }
 
+    def check_price_amounts(self):
+        """
+        Fail fast if a configured Price ID charges something other than the advertised amount
+
+        Raises:
+            ValueError: listing each tier whose Stripe price doesn't match TIER_AMOUNTS
+        """
+        mismatches = []
+        for tier, price_id in self.price_ids.items():
+            try:
+                price = stripe.Price.retrieve(price_id)
+            except stripe.error.StripeError as e:
+                log_event(self.logger, 'price_check_skipped', logging.WARNING, tier=tier, error=str(e))
+                continue
+            if price.unit_amount != self.TIER_AMOUNTS[tier]:
+                mismatches.append(f"{tier} {price_id} is {price.unit_amount}, expected {self.TIER_AMOUNTS[tier]}")
+        if mismatches:
+            raise ValueError("Stripe prices don't match the app's plans (re-run setup_stripe.py): "
+                             + "; ".join(mismatches))
+
+    def _line_item(self, tier: str) -> Dict:
+        """Price reference when configured, inline price_data only as a fallback"""
+        tier = "basic" if tier == "basic" else "pro"
+        if tier in self.price_ids:
+            return {'price': self.price_ids[tier], 'quantity': 1}
+
+        # Determine price based on tier
+        if tier == "basic":
+            price = self.PRICE_BASIC_MONTHLY
+            tier_name = "Basic"
+            tier_features = "Unlimited trips, 15 themes, voice commands"
+        else:  # pro
+            price = self.PRICE_PRO_MONTHLY
+            tier_name = "Pro"
+            tier_features = "Everything + 30 themes, AI assistant, screen capture"
+
+        return {
+            'price_data': {
+                'currency': self.currency,
+                'product_data': {
+                    'name': f'Spark Tracker {tier_name}',
+                    'description': tier_features,
+                },
+                'unit_amount': price,
+                'recurring': {
+                    'interval': 'month',
+                },
+            },
+            'quantity': 1,
+        }
+
     def create_customer_portal_session(
         self,
         customer_id: str,
@@ -127,29 +200,51 @@ class SparkPaymentProcessor:
                 'error': str(e)
             }
 
-    def handle_webhook_event(self, payload: bytes, sig_header: str) -> Dict:
+    def verify_webhook_event(self, payload: bytes, sig_header: str) -> Dict:
         """
-        Process Stripe webhook events
+        Check a webhook's Stripe signature and parse it (no side effects)
 
         Args:
             payload: Raw request body
             sig_header: Stripe signature header
 
         Returns:
-            Dict with processing result
+            Dict with the parsed event as a plain dict
         """
         webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_demo")
 
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, webhook_secret
+            stripe.WebhookSignature.verify_header(
+                payload.decode('utf-8') if isinstance(payload, bytes) else payload,
+                sig_header, webhook_secret,
+                tolerance=stripe.Webhook.DEFAULT_TOLERANCE  # Reject replays of old deliveries
             )
-        except ValueError:
+            event = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            log_event(self.logger, 'webhook_rejected', logging.WARNING, error='Invalid payload')
             return {'success': False, 'error': 'Invalid payload'}
         except stripe.error.SignatureVerificationError:
+            log_event(self.logger, 'webhook_rejected', logging.WARNING, error='Invalid signature')
             return {'success': False, 'error': 'Invalid signature'}
 
-        # Handle different event types
+        return {'success': True, 'event': event}
+
+    def dispatch_event(self, event: Dict) -> Dict:
+        """Route a verified event to its _handle_* method, logging its timing"""
+        start = time.perf_counter()
+        result = self._route_event(event)
+        log_event(
+            self.logger, 'webhook_handled',
+            event_id=event.get('id'),
+            event_type=event['type'],
+            action=result.get('action'),
+            customer_id=result.get('customer_id'),
+            success=result.get('success'),
+            duration_ms=round((time.perf_counter() - start) * 1000, 3)
+        )
+        return result
+
+    def _route_event(self, event: Dict) -> Dict:
         event_type = event['type']
         event_data = event['data']['object']
 
@@ -171,25 +266,67 @@ class SparkPaymentProcessor:
 
         return {'success': True, 'event_type': event_type}
 
+    def handle_webhook_event(self, payload: bytes, sig_header: str) -> Dict:
+        """
+        Process Stripe webhook events
+
+        Args:
+            payload: Raw request body
+            sig_header: Stripe signature header
+
+        Returns:
+            Dict with processing result
+        """
+        verified = self.verify_webhook_event(payload, sig_header)
+        if not verified['success']:
+            return verified
+
+        event = verified['event']
+        if self.idempotency is not None and not self.idempotency.claim(event):
+            log_event(self.logger, 'webhook_duplicate', event_id=event['id'], event_type=event['type'])
+            return {'success': True, 'duplicate': True, 'event_id': event['id']}
+
+        try:
+            result = self.dispatch_event(event)
+        except Exception:
+            if self.idempotency is not None:
+                self.idempotency.release(event['id'])
+            raise
+        if not result.get('success') and self.idempotency is not None:
+            self.idempotency.release(event['id'])
+        return result
+
+    def _unknown_customer(self, customer_id: Optional[str]) -> Dict:
+        """Status change for a customer whose checkout hasn't been recorded yet (out-of-order delivery)"""
+        log_event(self.logger, 'customer_not_found', logging.WARNING, customer_id=customer_id)
+        return {
+            'success': False,
+            'error': 'Unknown customer',
+            'retry': True,
+            'customer_id': customer_id
+        }
+
     def _handle_checkout_completed(self, session: Dict) -> Dict:
         """Handle successful checkout"""
-        customer_email = session.get('customer_email')
+        customer_email = session.get('customer_email') or (session.get('customer_details') or {}).get('email')
         customer_id = session.get('customer')
         subscription_id = session.get('subscription')
+        tier = (session.get('metadata') or {}).get('tier', 'pro')
 
-        # TODO: Update database - mark user as Pro tier
-        # This will be connected to Supabase in next iteration
+        if self.entitlements is not None and customer_email:
+            self.entitlements.grant(customer_email, tier, customer_id=customer_id,
+                                    subscription_id=subscription_id)
 
-        print(f"✅ Subscription activated: {customer_email}")
-        print(f"   Customer ID: {customer_id}")
-        print(f"   Subscription ID: {subscription_id}")
+        log_event(self.logger, 'subscription_activated', customer_email=customer_email,
+                  customer_id=customer_id, subscription_id=subscription_id, tier=tier)
 
         return {
             'success': True,
             'action': 'activate_subscription',
             'customer_email': customer_email,
             'customer_id': customer_id,
-            'subscription_id': subscription_id
+            'subscription_id': subscription_id,
+            'tier': tier
         }
 
     def _handle_subscription_updated(self, subscription: Dict) -> Dict:
@@ -197,7 +334,11 @@ class SparkPaymentProcessor:
         customer_id = subscription.get('customer')
         status = subscription.get('status')
 
-        print(f"📝 Subscription updated: {customer_id} -> {status}")
+        if self.entitlements is not None and self.entitlements.update_customer(customer_id, status) is None:
+            return self._unknown_customer(customer_id)
+
+        log_event(self.logger, 'subscription_updated', customer_id=customer_id,
+                  subscription_id=subscription.get('id'), status=status)
 
         return {
             'success': True,
@@ -210,7 +351,12 @@ class SparkPaymentProcessor:
         """Handle subscription cancellation"""
         customer_id = subscription.get('customer')
 
-        print(f"❌ Subscription cancelled: {customer_id}")
+        if self.entitlements is not None and \
+                self.entitlements.update_customer(customer_id, 'canceled', tier='free') is None:
+            return self._unknown_customer(customer_id)
+
+        log_event(self.logger, 'subscription_cancelled', customer_id=customer_id,
+                  subscription_id=subscription.get('id'))
 
         return {
             'success': True,
@@ -223,7 +369,14 @@ class SparkPaymentProcessor:
         customer_id = invoice.get('customer')
         customer_email = invoice.get('customer_email')
 
-        print(f"⚠️ Payment failed: {customer_email}")
+        if self.entitlements is not None:
+            # Keep access through Stripe's dunning retries; a final failure cancels the subscription
+            if self.entitlements.update_customer(customer_id, 'past_due') is None:
+                return self._unknown_customer(customer_id)
+
+        log_event(self.logger, 'payment_failed', logging.WARNING, customer_id=customer_id,
+                  customer_email=customer_email, invoice_id=invoice.get('id'),
+                  subscription_id=invoice.get('subscription'))
 
         # TODO: Send email reminder
 
@@ -236,32 +389,68 @@ class SparkPaymentProcessor:
 
     def create_referral_coupon(self, referrer_id: str) -> Dict:
         """
-        Create a 20% off coupon for referrals
+        Hand out a 20% off code for referrals
+
+        Uses a pre-minted promotion code from the referral pool when one is
+        configured and stocked; otherwise creates one promotion code on the
+        shared coupon synchronously (checkout only accepts promotion codes).
 
         Args:
             referrer_id: ID of user who made the referral
 
         Returns:
-            Dict with coupon code
+            Dict with the promotion code and its ID
         """
-        try:
-            coupon = stripe.Coupon.create(
-                percent_off=20,
-                duration='once',
-                name=f'Referral from {referrer_id}',
-                metadata={'referrer_id': referrer_id}
-            )
+        code = self.referral_pool.take(referrer_id) if self.referral_pool is not None else None
+        pooled = code is not None
+        if code is None:
+            try:
+                code = (self.referral_pool or ReferralCodePool()).mint_for(referrer_id)
+            except stripe.error.StripeError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
 
-            return {
-                'success': True,
-                'coupon_code': coupon.id
-            }
+        log_event(self.logger, 'referral_code_issued', referrer_id=referrer_id,
+                  promotion_code_id=code['promotion_code_id'], pooled=pooled)
+        return {
+            'success': True,
+            'coupon_code': code['code'],
+            'promotion_code_id': code['promotion_code_id']
+        }
 
-        except stripe.error.StripeError as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+
+def sign_webhook_payload(payload: bytes, secret: Optional[str] = None, timestamp: Optional[int] = None) -> str:
+    """
+    Build a Stripe-Signature header for a payload (local testing without the Stripe CLI)
+
+    Args:
+        payload: Raw JSON body to sign
+        secret: Webhook signing secret (defaults to STRIPE_WEBHOOK_SECRET)
+        timestamp: Unix time to sign with (defaults to now)
+
+    Returns:
+        Header value in Stripe's "t=...,v1=..." format
+    """
+    secret = secret or os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_demo")
+    timestamp = int(timestamp or time.time())
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), f"{timestamp}.{payload}".encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def signed_test_event(event_type: str, data: Dict, secret: Optional[str] = None) -> Tuple[bytes, str]:
+    """Fake Stripe event body plus a valid signature header for it"""
+    payload = json.dumps({
+        'id': f"evt_test_{uuid.uuid4().hex[:24]}",
+        'object': 'event',
+        'type': event_type,
+        'created': int(time.time()),
+        'data': {'object': data}
+    }).encode('utf-8')
+    return payload, sign_webhook_payload(payload, secret)
 
 
 # Example usage and testing
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tax Engine for Spark Tracker
+One streaming pass over a tax year's trips: business miles, gross pay,
+vehicle expenses, standard mileage (or estimated actual cost), Schedule C summary
+Built by SavvyTech Automations
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from money import from_cents
+from trip_record import as_trip
+
+# IRS business standard mileage rates ($/mile)
+STANDARD_MILEAGE_RATES = {
+    2022: 0.585,
+    2023: 0.655,
+    2024: 0.67,
+    2025: 0.70,
+    2026: 0.725,
+}
+# Mid-year IRS changes: year -> [(first day, rate)], applied by trip date
+MID_YEAR_RATES = {
+    2022: [('2022-07-01', 0.625)],
+}
+METHODS = ('standard', 'actual')
+METHOD_LABELS = {'standard': 'standard mileage', 'actual': 'actual cost, estimated'}
+
+
+def standard_mileage_rate(year: int, day: Optional[str] = None) -> float:
+    """
+    Rate for a tax year, or for a trip date within it
+
+    Args:
+        year: Tax year (latest known rate for years not in the table yet)
+        day: ISO trip date; picks up mid-year changes such as July 2022
+
+    Returns:
+        Rate in dollars per mile
+    """
+    if year in STANDARD_MILEAGE_RATES:
+        rate = STANDARD_MILEAGE_RATES[year]
+    else:
+        known = [y for y in STANDARD_MILEAGE_RATES if y <= year] or [min(STANDARD_MILEAGE_RATES)]
+        rate = STANDARD_MILEAGE_RATES[max(known)]
+    for start, changed in MID_YEAR_RATES.get(year, []):
+        if day is not None and day >= start:
+            rate = changed
+    return rate
+
+
+class TaxYearSummary:
+    """Running tax totals for one year, fed one trip at a time"""
+
+    def __init__(self, year: int):
+        self.year = year
+        self.prefix = f"{year}-"
+        self.trips = 0
+        self.gross_cents = 0
+        self.business_miles = 0.0
+        self.miles_by_rate: Dict[float, float] = {}  # Standard rate in effect on the trip date -> miles
+        self.vehicle_expense_cents = 0  # Gas + assumed wear & tear; an estimate, not receipts
+        self.by_quarter = {q: {'gross_cents': 0, 'miles': 0.0} for q in (1, 2, 3, 4)}
+
+    def add_trip(self, trip: Dict) -> bool:
+        """Fold a trip in; returns False if it belongs to another year"""
+        if not trip['date'].startswith(self.prefix):
+            return False
+        trip = as_trip(trip)
+        miles = trip.miles * 2  # Round trip, same as calculate_net_earnings
+        quarter = (int(trip.date[5:7]) - 1) // 3 + 1
+
+        self.trips += 1
+        self.gross_cents += trip.pay_cents
+        self.business_miles += miles
+        rate = standard_mileage_rate(self.year, trip.date)
+        self.miles_by_rate[rate] = self.miles_by_rate.get(rate, 0.0) + miles
+        self.vehicle_expense_cents += trip.pay_cents - trip.net_cents
+        self.by_quarter[quarter]['gross_cents'] += trip.pay_cents
+        self.by_quarter[quarter]['miles'] += miles
+        return True
+
+    def schedule_c(self, method: str = 'standard') -> Dict:
+        """
+        Schedule C-style summary using the vehicle deduction method the driver picked
+
+        The actual-cost figure is derived from tracked gas plus an assumed
+        $0.10/mi wear rate, so it is reported as an estimate and never picked
+        automatically; the driver elects a method (with their receipts).
+
+        Args:
+            method: 'standard' (IRS mileage rate) or 'actual' (estimated cost)
+
+        Returns:
+            Dict with line items, both deduction figures and the chosen method
+        """
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}")
+        standard = round(sum(miles * rate for rate, miles in self.miles_by_rate.items()) * 100)  # Cents
+        actual = self.vehicle_expense_cents
+        car_and_truck = standard if method == 'standard' else actual
+        net_profit = self.gross_cents - car_and_truck
+
+        return {
+            'year': self.year,
+            'trips': self.trips,
+            'business_miles': self.business_miles,
+            'mileage_rates': sorted(self.miles_by_rate) or [standard_mileage_rate(self.year)],
+            'standard_deduction': from_cents(standard),
+            'actual_deduction_estimate': from_cents(actual),
+            'method': method,
+            'line_1_gross_receipts': from_cents(self.gross_cents),
+            'line_9_car_and_truck': from_cents(car_and_truck),
+            'line_28_total_expenses': from_cents(car_and_truck),
+            'line_31_net_profit': from_cents(net_profit),
+            'cents': {
+                'gross_receipts': self.gross_cents,
+                'car_and_truck': car_and_truck,
+                'net_profit': net_profit
+            },
+            'by_quarter': self.by_quarter
+        }
+
+
+def tax_year_summary(trips: Iterable[Dict], year: int, method: str = 'standard') -> Dict:
+    """Schedule C summary for a year in a single pass over trips"""
+    summary = TaxYearSummary(year)
+    for trip in trips:
+        summary.add_trip(trip)
+    return summary.schedule_c(method)
+
+
+def schedule_c_rows(summary: Dict) -> List[Dict]:
+    """Line items as rows for display / CSV export"""
+    return [
+        {'Line': '1', 'Item': 'Gross receipts', 'Amount': summary['line_1_gross_receipts']},
+        {'Line': '9', 'Item': f"Car and truck expenses ({METHOD_LABELS[summary['method']]})",
+         'Amount': summary['line_9_car_and_truck']},
+        {'Line': '28', 'Item': 'Total expenses', 'Amount': summary['line_28_total_expenses']},
+        {'Line': '31', 'Item': 'Net profit', 'Amount': summary['line_31_net_profit']},
+    ]
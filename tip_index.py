@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tip Index for Spark Tracker
+Hashed per-address / per-customer rolling tip stats that flag
+consecutive tip reductions, with O(1) lookups while viewing an offer
+Built by SavvyTech Automations
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+
+class TipIndex:
+    """Rolling tip statistics keyed by a hash of the drop-off address or customer tag"""
+
+    FLAG_REDUCTIONS = 3     # Flag after this many tip drops in a row
+    SMOOTHING = 0.3         # Weight of the newest tip in the rolling average
+
+    def __init__(self):
+        self.entries: Dict[str, Dict] = {}
+
+    @staticmethod
+    def make_key(address: str) -> str:
+        """Normalize and hash an address so '123 Main St.' == '123 main st'"""
+        normalized = re.sub(r'[^a-z0-9 ]', '', address.lower())
+        normalized = ' '.join(normalized.split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+    def record(self, address: str, tip: Optional[float]) -> Dict:
+        """
+        Add a trip to an address and return its updated stats
+
+        Args:
+            address: Drop-off address or customer tag
+            tip: Tip in dollars, or None if it wasn't entered (counted as a
+                visit only, never as a $0 tip or a reduction)
+
+        Returns:
+            The address's stats dict
+        """
+        key = self.make_key(address)
+        entry = self.entries.get(key)
+
+        if entry is None:
+            entry = {
+                'label': address.strip(), 'count': 0, 'tipped': 0, 'avg_tip': None,
+                'last_tip': None, 'last_change': 0.0, 'reductions': 0, 'streak': 0
+            }
+            self.entries[key] = entry
+        entry['count'] += 1
+        if tip is None:
+            return entry
+
+        entry['tipped'] += 1
+        if entry['last_tip'] is None:
+            entry['avg_tip'] = tip
+            entry['last_tip'] = tip
+        else:
+            change = tip - entry['last_tip']
+            entry['last_change'] = change
+            if change < 0:
+                entry['reductions'] += 1
+                entry['streak'] += 1
+            else:
+                entry['streak'] = 0
+            entry['avg_tip'] = self.SMOOTHING * tip + (1 - self.SMOOTHING) * entry['avg_tip']
+            entry['last_tip'] = tip
+        return entry
+
+    def lookup(self, address: str) -> Optional[Dict]:
+        """Stats for an address, or None if never seen"""
+        if not address or not address.strip():
+            return None
+        return self.entries.get(self.make_key(address))
+
+    def is_flagged(self, entry: Optional[Dict]) -> bool:
+        """Currently cutting tips: the last FLAG_REDUCTIONS tips each dropped (a raise clears it)"""
+        return entry is not None and entry['streak'] >= self.FLAG_REDUCTIONS
+
+    def flagged(self) -> List[Dict]:
+        """All flagged addresses, worst first"""
+        hits = [e for e in self.entries.values() if self.is_flagged(e)]
+        return sorted(hits, key=lambda e: e['streak'], reverse=True)
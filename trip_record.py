@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Compact Trip Record for Spark Tracker
+Slotted Trip type with interned enum categories, replacing the
+string-keyed dicts held in trips_data for large histories
+Built by SavvyTech Automations
+"""
+
+import hashlib
+import struct
+import sys
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Set, Union
+
+import numpy as np
+
+from money import from_cents, to_cents
+
+
+class Rating(str, Enum):
+    EXCELLENT = "excellent"
+    GOOD = "good"
+    SHIT = "shit"
+    UNKNOWN = "unknown"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+class Vehicle(str, Enum):
+    COUPE = "Coupe"
+    SEDAN = "Sedan"
+    LARGE_CAR = "Large Car"
+    PICKUP_TRUCK = "Pickup Truck"
+    FOUR_DOOR_TRUCK = "4-Door Truck"
+    MINIVAN = "Minivan"
+    SUV_CROSSOVER = "SUV (Crossover)"
+    LARGE_SUV = "Large SUV"
+    ELECTRIC = "Electric"
+    HYBRID = "Hybrid"
+
+    def __str__(self) -> str:
+        return self.value
+
+
+def _enum_or_interned(enum_type, value):
+    """Enum member for known values; interned string otherwise so repeats still share memory"""
+    if value is None or isinstance(value, enum_type):
+        return value
+    try:
+        return enum_type(value)
+    except ValueError:
+        return sys.intern(str(value))
+
+
+# Numeric fields packed into one bytes blob instead of a boxed object per field:
+# pay_cents, net_cents, tip_cents, miles, shop_minutes, time, stops, shop_items, flags
+_PACKED = struct.Struct('<qqqddIhhB')
+# Same layout as a NumPy record, so many trips decode in one vectorized pass
+_PACKED_DTYPE = np.dtype([
+    ('pay_cents', '<i8'), ('net_cents', '<i8'), ('tip_cents', '<i8'), ('miles', '<f8'),
+    ('shop_minutes', '<f8'), ('time', '<u4'), ('stops', '<i2'), ('shop_items', '<i2'), ('flags', 'u1')
+])
+_SHOPPING, _INCENTIVE, _HAS_SHOP_MINUTES, _HAS_TIP = 1, 2, 4, 8
+
+# Text fields most trips leave empty; stored together only when at least one is set
+_EXTRA_FIELDS = ('notes', 'address', 'shop_start', 'shop_end')
+
+
+def _numeric(index: int):
+    return property(lambda self: _PACKED.unpack(self._packed)[index])
+
+
+def _dollars(index: int):
+    return property(lambda self: from_cents(_PACKED.unpack(self._packed)[index]))
+
+
+def _extra(name: str, default=None):
+    return property(lambda self: self._extra.get(name, default) if self._extra else default)
+
+
+class Trip:
+    """One logged trip; same field names as the old trip dict"""
+
+    __slots__ = ('date', 'rating', 'vehicle', '_packed', '_extra')
+
+    FIELDS = (
+        'date', 'pay', 'miles', 'time', 'stops', 'net', 'rating', 'vehicle',
+        'shopping', 'incentive', 'notes', 'address', 'tip',
+        'shop_start', 'shop_end', 'shop_minutes', 'shop_items'
+    )
+
+    # Storage form: same as FIELDS but money as integer cents
+    STORAGE_FIELDS = tuple(
+        f"{f}_cents" if f in ('pay', 'net', 'tip') else f for f in FIELDS
+    )
+
+    def __init__(self, date: str, pay: float = None, miles: float = 0.0, time: int = 0, stops: int = 1,
+                 net: float = None, rating: Union[Rating, str] = Rating.UNKNOWN,
+                 vehicle: Union[Vehicle, str, None] = None, shopping: bool = False, incentive: bool = False,
+                 notes: str = "", address: str = None, tip: float = None, shop_start: str = None,
+                 shop_end: str = None, shop_minutes: float = None, shop_items: int = None,
+                 pay_cents: int = None, net_cents: int = None, tip_cents: int = None):
+        self.date = sys.intern(date)  # Many trips share a day
+        self.rating = _enum_or_interned(Rating, rating)
+        self.vehicle = _enum_or_interned(Vehicle, vehicle)
+
+        flags = (_SHOPPING if shopping else 0) | (_INCENTIVE if incentive else 0)
+        if shop_minutes is not None:
+            flags |= _HAS_SHOP_MINUTES
+        if tip is not None or tip_cents is not None:
+            flags |= _HAS_TIP  # No tip entered is None, not $0.00
+        # Money arrives in dollars from the UI / CSV, or already in cents from storage
+        self._packed = _PACKED.pack(
+            int(pay_cents) if pay_cents is not None else to_cents(pay or 0),
+            int(net_cents) if net_cents is not None else to_cents(net or 0),
+            int(tip_cents) if tip_cents is not None else to_cents(tip or 0),
+            miles, shop_minutes or 0.0, int(time), int(stops),
+            -1 if shop_items is None else int(shop_items), flags
+        )
+
+        values = dict(zip(_EXTRA_FIELDS, (notes, address, shop_start, shop_end)))
+        extra = {k: sys.intern(v) if k.startswith('shop_') else v for k, v in values.items() if v}
+        self._extra = extra or None
+
+    pay_cents = _numeric(0)
+    net_cents = _numeric(1)
+    pay = _dollars(0)
+    net = _dollars(1)
+    miles = _numeric(3)
+    time = _numeric(5)
+    stops = _numeric(6)
+
+    @property
+    def shop_minutes(self):
+        values = _PACKED.unpack(self._packed)
+        return values[4] if values[8] & _HAS_SHOP_MINUTES else None
+
+    @property
+    def tip_cents(self):
+        values = _PACKED.unpack(self._packed)
+        return values[2] if values[8] & _HAS_TIP else None
+
+    @property
+    def tip(self):
+        cents = self.tip_cents
+        return None if cents is None else from_cents(cents)
+
+    @property
+    def shop_items(self):
+        items = _PACKED.unpack(self._packed)[7]
+        return None if items < 0 else items
+
+    @property
+    def shopping(self) -> bool:
+        return bool(_PACKED.unpack(self._packed)[8] & _SHOPPING)
+
+    @property
+    def incentive(self) -> bool:
+        return bool(_PACKED.unpack(self._packed)[8] & _INCENTIVE)
+
+    notes = _extra('notes', "")
+    address = _extra('address')
+    shop_start = _extra('shop_start')
+    shop_end = _extra('shop_end')
+
+    # Read-only mapping access so trip['pay'] / trip.get('tip') keep working
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, dict):
+            other = Trip.from_dict(other)
+        if not isinstance(other, Trip):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Trip(date={self.date!r}, pay={self.pay!r}, miles={self.miles!r}, net={self.net!r})"
+
+    def _as_plain_dict(self, fields) -> Dict:
+        data = {f: getattr(self, f) for f in fields}
+        for f in ('rating', 'vehicle'):
+            if isinstance(data[f], Enum):
+                data[f] = data[f].value
+        return data
+
+    def to_dict(self) -> Dict:
+        """Plain dict with money in dollars, for DataFrames / CSV / display"""
+        return self._as_plain_dict(self.FIELDS)
+
+    def to_storage(self) -> Dict:
+        """JSON-ready dict with money as integer cents, for persistence"""
+        return self._as_plain_dict(self.STORAGE_FIELDS)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Trip":
+        """Build from a dollar or cents trip dict (missing newer fields fall back to defaults)"""
+        return cls(**{f: data[f] for f in cls.FIELDS + cls.STORAGE_FIELDS if f in data})
+
+
+def as_trip(trip: Union[Trip, Dict]) -> Trip:
+    """Trip record from a Trip or a trip dict"""
+    return trip if isinstance(trip, Trip) else Trip.from_dict(trip)
+
+
+def as_dict(trip: Union[Trip, Dict]) -> Dict:
+    """Dict view of a Trip or an already-plain trip dict"""
+    return trip.to_dict() if isinstance(trip, Trip) else trip
+
+
+def as_storage(trip: Union[Trip, Dict]) -> Dict:
+    """Cents-based storage dict for a Trip or trip dict"""
+    return as_trip(trip).to_storage()
+
+
+def as_records(trips: Iterable[Union[Trip, Dict]]) -> List[Dict]:
+    """Plain dicts for DataFrame / CSV / JSON edges"""
+    return [as_dict(t) for t in trips]
+
+
+def fingerprint(trip: Union[Trip, Dict]) -> str:
+    """Content identity of a trip: date, pay, miles, time, stops, vehicle"""
+    trip = as_trip(trip)
+    key = "|".join((
+        trip.date,
+        str(trip.pay_cents),
+        f"{trip.miles:.1f}",
+        str(trip.time),
+        str(trip.stops),
+        str(trip.vehicle or ''),
+    ))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def trip_columns(trips: Iterable[Union[Trip, Dict]]) -> np.ndarray:
+    """
+    Numeric fields of many trips as one structured array
+
+    Joins the packed blobs and views them through _PACKED_DTYPE, instead of a
+    struct.unpack per field access (e.g. columns['net_cents'].sum()).
+    """
+    packed = b''.join(as_trip(t)._packed for t in trips)
+    return np.frombuffer(packed, dtype=_PACKED_DTYPE)
+
+
+class FingerprintIndex:
+    """Hash set of trip fingerprints; makes saves and imports idempotent in O(1) per row"""
+
+    def __init__(self, trips: Iterable[Union[Trip, Dict]] = ()):
+        self._seen: Set[str] = {fingerprint(t) for t in trips}
+
+    def __contains__(self, trip: Union[Trip, Dict]) -> bool:
+        return fingerprint(trip) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, trip: Union[Trip, Dict]) -> bool:
+        """Record a trip; False if an identical trip was already there"""
+        fp = fingerprint(trip)
+        if fp in self._seen:
+            return False
+        self._seen.add(fp)
+        return True
+
+    def upsert_many(self, trips: Iterable[Union[Trip, Dict]]) -> List[Union[Trip, Dict]]:
+        """Trips from a batch not seen before (also de-dupes within the batch)"""
+        return [t for t in trips if self.add(t)]
+
+
+def measure_trip_memory(n: int = 100_000) -> Dict:
+    """Bytes per trip held as dicts vs. Trip records (tracemalloc)"""
+    import random
+    import tracemalloc
+
+    def raw(i):
+        pay = round(random.uniform(6, 40), 2)
+        return {
+            'date': f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 'pay': pay,
+            'miles': round(random.uniform(1, 20), 1), 'time': random.randint(10, 90),
+            'stops': random.randint(1, 4), 'net': round(pay * 0.7, 2),
+            'rating': random.choice(['excellent', 'good', 'shit']), 'vehicle': 'Sedan',
+            'shopping': False, 'incentive': False, 'notes': '', 'address': None, 'tip': 0.0,
+            'shop_start': None, 'shop_end': None, 'shop_minutes': None, 'shop_items': None
+        }
+
+    results = {}
+    for label, build in (('dict', lambda i: raw(i)), ('Trip', lambda i: Trip.from_dict(raw(i)))):
+        random.seed(0)
+        tracemalloc.start()
+        trips = [build(i) for i in range(n)]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[label] = current / n
+        del trips
+    results['reduction'] = results['dict'] / results['Trip']
+    return results
+
+
+if __name__ == "__main__":
+    stats = measure_trip_memory()
+    print(f"🧪 dict: {stats['dict']:.0f} B/trip · Trip: {stats['Trip']:.0f} B/trip · {stats['reduction']:.1f}x smaller")
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Shared Trip & Entitlement Store for Spark Tracker
+Repository interface over a pooled SQL connection manager
+(SQLite locally, Postgres/Supabase in production)
+Built by SavvyTech Automations
+"""
+
+import abc
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from trip_record import Trip, as_storage, fingerprint
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///spark_tracker.db")
+
+
+def _disconnect_errors(dialect: str) -> Tuple:
+    """Driver errors after which a connection can't be trusted back in the pool"""
+    if dialect == 'postgres':
+        try:
+            import psycopg2
+            return (psycopg2.OperationalError, psycopg2.InterfaceError)
+        except ImportError:
+            return ()  # _connect reports the missing driver
+    return (sqlite3.OperationalError, sqlite3.InterfaceError)
+
+
+class ConnectionPool:
+    """Fixed-size pool of DB connections shared by every session in the process"""
+
+    def __init__(self, url: str = DATABASE_URL, size: int = 5):
+        self.url = url
+        self.size = size
+        self.dialect = 'postgres' if url.startswith(('postgres://', 'postgresql://')) else 'sqlite'
+        self.placeholder = '%s' if self.dialect == 'postgres' else '?'
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._disconnect_errors = _disconnect_errors(self.dialect)
+
+    def _connect(self):
+        if self.dialect == 'postgres':
+            try:
+                import psycopg2
+            except ImportError:
+                raise ImportError("Postgres DATABASE_URL requires psycopg2: pip install psycopg2-binary")
+            return psycopg2.connect(self.url)
+
+        path = self.url.replace('sqlite:///', '', 1)
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")  # Readers don't block the writer
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    break
+            try:
+                # Pool exhausted; wake up now and then in case a broken connection freed a slot
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        try:
+            return self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self._lock:
+            self._created -= 1
+
+    def _discard(self, conn):
+        """Close a broken connection and free its slot so the next borrower reconnects"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._release_slot()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """Borrow a connection for one transaction (commit on success, rollback on error)"""
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except self._disconnect_errors:
+            broken = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if broken:
+                self._discard(conn)
+            else:
+                self._idle.put(conn)
+
+    def sql(self, statement: str) -> str:
+        """Rewrite '?' placeholders for the active dialect"""
+        return statement.replace('?', self.placeholder)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class TripRepository(abc.ABC):
+    """Storage interface the app talks to; swap implementations without touching pages"""
+
+    @abc.abstractmethod
+    def add_trip(self, user_id: str, trip: Dict):
+        raise NotImplementedError
+
+    def add_trips(self, user_id: str, trips: List[Dict]):
+        self.write_batch([(user_id, trip) for trip in trips])
+
+    def write_batch(self, rows: List[Tuple[str, Dict]]):
+        """Persist (user_id, trip) rows from many users; implementations should commit once"""
+        for user_id, trip in rows:
+            self.add_trip(user_id, trip)
+
+    @abc.abstractmethod
+    def list_trips(self, user_id: str) -> List[Trip]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def move_trips(self, from_user: str, to_user: str) -> int:
+        """Reassign one user's trips to another, skipping ones the target already has"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def trips_since(self, day: str) -> List[Tuple[str, Trip]]:
+        """(user_id, trip) for every user's trips dated on or after day (ISO date)"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_driver_state(self, user_id: str, name: str) -> Optional[Dict]:
+        """A driver's saved model state (e.g. their score sketch), or None"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_driver_state(self, user_id: str, name: str, data: Dict):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_entitlement(self, email: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_entitlement_by_customer(self, customer_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def set_entitlement(self, email: str, tier: str, customer_id: Optional[str] = None,
+                        subscription_id: Optional[str] = None, status: str = 'active'):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_entitlements(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def set_entitlements(self, rows: List[Dict]):
+        """Upsert many entitlements (dicts like get_entitlement's) in one transaction"""
+        for row in rows:
+            self.set_entitlement(row['email'], row['tier'], customer_id=row.get('customer_id'),
+                                 subscription_id=row.get('subscription_id'), status=row.get('status', 'active'))
+
+    @abc.abstractmethod
+    def claim_event(self, event_id: str, event_type: str) -> bool:
+        """Record a webhook event id; False if it was already recorded"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release_event(self, event_id: str):
+        """Forget an event id so a redelivery is processed again"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def record_failed_event(self, event: Dict, error: str, attempts: int):
+        """Dead-letter an event whose handler kept failing after it was acked"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def list_failed_events(self) -> List[Dict]:
+        """Dead-lettered events, oldest first"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_failed_event(self, event_id: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def burn_login_nonce(self, nonce: str, expires_at: int) -> bool:
+        """Mark a sign-in link's nonce used; False if it already was"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def prune_events(self, older_than_days: int = 30) -> int:
+        """Drop event ids older than the cutoff; returns how many were removed"""
+        raise NotImplementedError
+
+
+class SqlTripRepository(TripRepository):
+    """TripRepository backed by a ConnectionPool (SQLite or Postgres)"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._create_schema()
+
+    def _create_schema(self):
+        trip_id = "SERIAL PRIMARY KEY" if self.pool.dialect == 'postgres' else "INTEGER PRIMARY KEY AUTOINCREMENT"
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS trips (
+                    id {trip_id},
+                    user_id TEXT NOT NULL,
+                    trip_date TEXT NOT NULL,
+                    pay_cents BIGINT NOT NULL,
+                    net_cents BIGINT NOT NULL,
+                    miles REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS trips_user_date ON trips (user_id, trip_date)")
+            cur.execute("CREATE INDEX IF NOT EXISTS trips_date ON trips (trip_date)")
+            self._add_column(cur, 'trips', 'fingerprint', 'TEXT')
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS trips_user_fingerprint ON trips (user_id, fingerprint)")
+            self._backfill_fingerprints(cur)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS driver_state (
+                    user_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (user_id, name)
+                )
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS entitlements (
+                    email TEXT PRIMARY KEY,
+                    customer_id TEXT,
+                    subscription_id TEXT,
+                    tier TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS entitlements_customer ON entitlements (customer_id)")
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS processed_events (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    received_at TEXT NOT NULL
+                )
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS failed_events (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    error TEXT,
+                    attempts INTEGER NOT NULL,
+                    failed_at TEXT NOT NULL
+                )
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS used_login_nonces (
+                    nonce TEXT PRIMARY KEY,
+                    expires_at BIGINT NOT NULL
+                )
+            """)
+
+    def _add_column(self, cur, table: str, column: str, column_type: str):
+        """Additive migration for tables created by older versions"""
+        if self.pool.dialect == 'postgres':
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}")
+            return
+        cur.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in cur.fetchall()]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _backfill_fingerprints(self, cur):
+        """Fingerprint rows saved before the column existed; later copies of the same trip are dropped"""
+        cur.execute("SELECT id, user_id, data FROM trips WHERE fingerprint IS NULL ORDER BY id")
+        rows = cur.fetchall()
+        if not rows:
+            return
+        cur.execute("SELECT user_id, fingerprint FROM trips WHERE fingerprint IS NOT NULL "
+                    "AND user_id IN (SELECT user_id FROM trips WHERE fingerprint IS NULL)")
+        seen = set(cur.fetchall())
+        updates, duplicates = [], []
+        for trip_id, user_id, data in rows:
+            key = (user_id, fingerprint(json.loads(data)))
+            if key in seen:
+                duplicates.append((trip_id,))
+            else:
+                seen.add(key)
+                updates.append((key[1], trip_id))
+        cur.executemany(self.pool.sql("UPDATE trips SET fingerprint = ? WHERE id = ?"), updates)
+        cur.executemany(self.pool.sql("DELETE FROM trips WHERE id = ?"), duplicates)
+
+    def add_trip(self, user_id: str, trip: Dict):
+        self.add_trips(user_id, [trip])
+
+    def write_batch(self, rows: List[Tuple[str, Dict]]):
+        """
+        Upsert trips for any number of users in a single transaction (group commit)
+
+        Rows whose (user_id, fingerprint) already exists are skipped, so replays are idempotent.
+        """
+        values = []
+        for user_id, t in rows:
+            data = as_storage(t)
+            values.append((user_id, data['date'], data['pay_cents'], data['net_cents'], data['miles'],
+                           json.dumps(data), fingerprint(t)))
+        with self.pool.connection() as conn:
+            conn.cursor().executemany(self.pool.sql(
+                "INSERT INTO trips (user_id, trip_date, pay_cents, net_cents, miles, data, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, fingerprint) DO NOTHING"
+            ), values)
+
+    def list_trips(self, user_id: str) -> List[Trip]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql("SELECT data FROM trips WHERE user_id = ? ORDER BY trip_date, id"), (user_id,))
+            return [Trip.from_dict(json.loads(row[0])) for row in cur.fetchall()]
+
+    def trips_since(self, day: str) -> List[Tuple[str, Trip]]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql("SELECT user_id, data FROM trips WHERE trip_date >= ? ORDER BY trip_date, id"), (day,))
+            return [(user_id, Trip.from_dict(json.loads(data))) for user_id, data in cur.fetchall()]
+
+    def move_trips(self, from_user: str, to_user: str) -> int:
+        """Copy then delete in one transaction; the unique fingerprint index drops duplicates"""
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql(
+                "INSERT INTO trips (user_id, trip_date, pay_cents, net_cents, miles, data, fingerprint) "
+                "SELECT ?, trip_date, pay_cents, net_cents, miles, data, fingerprint FROM trips "
+                "WHERE user_id = ? ORDER BY trip_date, id ON CONFLICT (user_id, fingerprint) DO NOTHING"
+            ), (to_user, from_user))
+            moved = cur.rowcount
+            cur.execute(self.pool.sql("DELETE FROM trips WHERE user_id = ?"), (from_user,))
+            return moved
+
+    def user_totals_cents(self, user_id: str) -> Dict:
+        """Exact gross/net cents for a user, summed in the database"""
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql(
+                "SELECT COUNT(*), COALESCE(SUM(pay_cents), 0), COALESCE(SUM(net_cents), 0) FROM trips WHERE user_id = ?"
+            ), (user_id,))
+            trips, gross, net = cur.fetchone()
+        return {'trips': trips, 'gross_cents': int(gross), 'net_cents': int(net)}
+
+    def get_driver_state(self, user_id: str, name: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql("SELECT data FROM driver_state WHERE user_id = ? AND name = ?"), (user_id, name))
+            row = cur.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_driver_state(self, user_id: str, name: str, data: Dict):
+        with self.pool.connection() as conn:
+            conn.cursor().execute(self.pool.sql(
+                "INSERT INTO driver_state (user_id, name, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at"
+            ), (user_id, name, json.dumps(data), datetime.utcnow().isoformat()))
+
+    ENTITLEMENT_COLUMNS = ('email', 'customer_id', 'subscription_id', 'tier', 'status', 'updated_at')
+
+    def _entitlement_where(self, column: str, value: str) -> Optional[Dict]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql(
+                f"SELECT {', '.join(self.ENTITLEMENT_COLUMNS)} "
+                f"FROM entitlements WHERE {column} = ? ORDER BY updated_at DESC"
+            ), (value,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return dict(zip(self.ENTITLEMENT_COLUMNS, row))
+
+    def list_entitlements(self) -> List[Dict]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {', '.join(self.ENTITLEMENT_COLUMNS)} FROM entitlements")
+            return [dict(zip(self.ENTITLEMENT_COLUMNS, row)) for row in cur.fetchall()]
+
+    def get_entitlement(self, email: str) -> Optional[Dict]:
+        return self._entitlement_where('email', email)
+
+    def get_entitlement_by_customer(self, customer_id: str) -> Optional[Dict]:
+        return self._entitlement_where('customer_id', customer_id)
+
+    def set_entitlement(self, email: str, tier: str, customer_id: Optional[str] = None,
+                        subscription_id: Optional[str] = None, status: str = 'active'):
+        self.set_entitlements([{'email': email, 'tier': tier, 'customer_id': customer_id,
+                                'subscription_id': subscription_id, 'status': status}])
+
+    def set_entitlements(self, rows: List[Dict]):
+        now = datetime.utcnow().isoformat()
+        values = [(row['email'], row.get('customer_id'), row.get('subscription_id'), row['tier'],
+                   row.get('status', 'active'), now) for row in rows]
+        with self.pool.connection() as conn:
+            conn.cursor().executemany(self.pool.sql("""
+                INSERT INTO entitlements (email, customer_id, subscription_id, tier, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (email) DO UPDATE SET
+                    customer_id = COALESCE(excluded.customer_id, entitlements.customer_id),
+                    subscription_id = COALESCE(excluded.subscription_id, entitlements.subscription_id),
+                    tier = excluded.tier,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+            """), values)
+
+    def claim_event(self, event_id: str, event_type: str) -> bool:
+        """Insert-if-absent on the primary key; exactly one concurrent caller wins"""
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql(
+                "INSERT INTO processed_events (event_id, event_type, received_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (event_id) DO NOTHING"
+            ), (event_id, event_type, datetime.utcnow().isoformat()))
+            return cur.rowcount == 1
+
+    def release_event(self, event_id: str):
+        with self.pool.connection() as conn:
+            conn.cursor().execute(self.pool.sql("DELETE FROM processed_events WHERE event_id = ?"), (event_id,))
+
+    def record_failed_event(self, event: Dict, error: str, attempts: int):
+        with self.pool.connection() as conn:
+            conn.cursor().execute(self.pool.sql("""
+                INSERT INTO failed_events (event_id, event_type, payload, error, attempts, failed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (event_id) DO UPDATE SET
+                    error = excluded.error,
+                    attempts = failed_events.attempts + excluded.attempts,
+                    failed_at = excluded.failed_at
+            """), (event['id'], event['type'], json.dumps(event), error, attempts, datetime.utcnow().isoformat()))
+
+    def list_failed_events(self) -> List[Dict]:
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT payload FROM failed_events ORDER BY failed_at")
+            return [json.loads(row[0]) for row in cur.fetchall()]
+
+    def delete_failed_event(self, event_id: str):
+        with self.pool.connection() as conn:
+            conn.cursor().execute(self.pool.sql("DELETE FROM failed_events WHERE event_id = ?"), (event_id,))
+
+    def burn_login_nonce(self, nonce: str, expires_at: int) -> bool:
+        """Insert-if-absent like claim_event, so a link signs in exactly once"""
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            # Expired links fail verification anyway; their nonces needn't be kept
+            cur.execute(self.pool.sql("DELETE FROM used_login_nonces WHERE expires_at < ?"), (int(time.time()),))
+            cur.execute(self.pool.sql(
+                "INSERT INTO used_login_nonces (nonce, expires_at) VALUES (?, ?) ON CONFLICT (nonce) DO NOTHING"
+            ), (nonce, int(expires_at)))
+            return cur.rowcount == 1
+
+    def prune_events(self, older_than_days: int = 30) -> int:
+        """Drop old event ids (Stripe stops retrying after 3 days)"""
+        cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self.pool.sql("DELETE FROM processed_events WHERE received_at < ?"), (cutoff,))
+            return cur.rowcount
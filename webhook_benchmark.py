@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Webhook Throughput Benchmark for Spark Tracker
+Generates correctly signed synthetic Stripe events of every handled type
+and measures handle_webhook_event latency/throughput, single-threaded
+and on a worker pool
+Built by SavvyTech Automations
+
+Usage:
+    python webhook_benchmark.py                       # 5000 events, 1/2/4/8 threads
+    python webhook_benchmark.py --events 20000 --pool process --workers 1 4
+    python webhook_benchmark.py --with-store          # include SQLite idempotency + entitlements
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from payment_logging import configure_payment_logging
+from stripe_integration import SparkPaymentProcessor, signed_test_event
+
+HANDLED_EVENT_TYPES = ('checkout.session.completed', 'customer.subscription.updated',
+                       'customer.subscription.deleted', 'invoice.payment_failed')
+
+# Per-process state for pool workers
+_processor: Optional[SparkPaymentProcessor] = None
+
+
+def synthetic_event(event_type: str, n: int) -> Dict:
+    """Event data object shaped like Stripe's for one handled type"""
+    customer_id = f"cus_bench{n:08d}"
+    email = f"driver{n}@example.com"
+    if event_type == 'checkout.session.completed':
+        return {'id': f"cs_test_{uuid.uuid4().hex[:24]}", 'object': 'checkout.session', 'customer': customer_id,
+                'customer_email': email, 'subscription': f"sub_bench{n:08d}", 'mode': 'subscription',
+                'payment_status': 'paid', 'metadata': {'tier': 'pro' if n % 2 else 'basic', 'product': 'spark_tracker'}}
+    if event_type == 'invoice.payment_failed':
+        return {'id': f"in_bench{n:08d}", 'object': 'invoice', 'customer': customer_id,
+                'customer_email': email, 'amount_due': 999, 'attempt_count': 1}
+    status = 'canceled' if event_type == 'customer.subscription.deleted' else 'active'
+    return {'id': f"sub_bench{n:08d}", 'object': 'subscription', 'customer': customer_id, 'status': status}
+
+
+def generate_deliveries(count: int, secret: Optional[str] = None) -> List[Tuple[bytes, str]]:
+    """(payload, Stripe-Signature header) pairs cycling through every handled type"""
+    deliveries = []
+    for n in range(count):
+        event_type = HANDLED_EVENT_TYPES[n % len(HANDLED_EVENT_TYPES)]
+        deliveries.append(signed_test_event(event_type, synthetic_event(event_type, n // len(HANDLED_EVENT_TYPES)), secret))
+    return deliveries
+
+
+def build_processor(with_store: bool) -> SparkPaymentProcessor:
+    if not with_store:
+        return SparkPaymentProcessor()
+    from webhook_service import build_processor as build_stored_processor
+    return build_stored_processor(f"sqlite:///{tempfile.mkdtemp(prefix='spark_webhook_bench_')}/bench.db")
+
+
+def _init_worker(with_store: bool):
+    global _processor
+    # Keep the queue-backed logging on the measured path, but discard its output
+    configure_payment_logging(handlers=[logging.NullHandler()])
+    _processor = build_processor(with_store)
+
+
+def _handle(delivery: Tuple[bytes, str]) -> Tuple[float, bool]:
+    """Process one delivery; returns (latency seconds, success)"""
+    payload, sig_header = delivery
+    start = time.perf_counter()
+    result = _processor.handle_webhook_event(payload, sig_header)
+    return time.perf_counter() - start, result.get('success', False)
+
+
+def _handle_chunk(chunk: List[Tuple[bytes, str]]) -> List[Tuple[float, bool]]:
+    return [_handle(delivery) for delivery in chunk]
+
+
+def run(deliveries: List[Tuple[bytes, str]], workers: int, pool: str = 'thread', with_store: bool = False) -> Dict:
+    """
+    Push every delivery through handle_webhook_event
+
+    Args:
+        deliveries: Signed (payload, header) pairs
+        workers: 1 for a plain loop, otherwise the pool size
+        pool: 'thread' or 'process'
+        with_store: Include SQLite idempotency + entitlement writes
+
+    Returns:
+        Dict with events/sec and latency percentiles (ms)
+    """
+    chunk_size = max(1, len(deliveries) // (workers * 4))
+    chunks = [deliveries[i:i + chunk_size] for i in range(0, len(deliveries), chunk_size)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(with_store)
+        results = _handle_chunk(deliveries)
+    elif pool == 'process':
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(with_store,)) as ex:
+            results = [r for part in ex.map(_handle_chunk, chunks) for r in part]
+    else:
+        # Threads share one processor, like the ASGI service's workers
+        _init_worker(with_store)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            results = [r for part in ex.map(_handle_chunk, chunks) for r in part]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'workers': workers,
+        'events': len(results),
+        'failed': sum(1 for _, ok in results if not ok),
+        'seconds': elapsed,
+        'events_per_sec': len(results) / elapsed,
+        'p50_ms': quantiles[49],
+        'p95_ms': quantiles[94],
+        'p99_ms': quantiles[98]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Stripe webhook handling")
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--with-store', action='store_true')
+    args = parser.parse_args()
+
+    os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_benchmark")
+    print(f"🧪 Signing {args.events} events ({', '.join(HANDLED_EVENT_TYPES)})...")
+    deliveries = generate_deliveries(args.events)
+
+    print(f"\n{'workers':>8} {'events/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for workers in args.workers:
+        r = run(deliveries, workers, args.pool, args.with_store)
+        print(f"{workers:>8} {r['events_per_sec']:>10.0f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['p99_ms']:>8.3f} {r['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
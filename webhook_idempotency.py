@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Webhook Idempotency Store for Spark Tracker
+Stripe redelivers events; each event id is claimed once in the
+processed_events table, fronted by an in-memory LRU/TTL cache
+Built by SavvyTech Automations
+"""
+
+from typing import Dict, List
+
+from shared_cache import SharedCache
+from trip_store import TripRepository
+
+# Stripe retries for up to 3 days; keep recent ids hot in memory for that long
+SEEN_TTL = 3 * 24 * 3600
+SEEN_MAX_ENTRIES = 100_000
+PRUNE_AFTER_DAYS = 30
+
+
+class EventIdempotency:
+    """Claim-once gate for Stripe event ids"""
+
+    def __init__(self, repository: TripRepository, cache: SharedCache = None):
+        self.repository = repository
+        self.cache = cache or SharedCache(max_entries=SEEN_MAX_ENTRIES, default_ttl=SEEN_TTL)
+
+    def seen(self, event_id: str) -> bool:
+        """O(1) in-memory check; a miss doesn't prove the event is new"""
+        return self.cache.get(event_id, False)
+
+    def claim(self, event: Dict) -> bool:
+        """
+        Claim an event for processing
+
+        Args:
+            event: Verified Stripe event (needs 'id' and 'type')
+
+        Returns:
+            True exactly once per event id, False for duplicates
+        """
+        event_id = event['id']
+        if self.seen(event_id):
+            return False
+        claimed = self.repository.claim_event(event_id, event['type'])
+        self.cache.set(event_id, True)  # Either way the id is now recorded
+        return claimed
+
+    def release(self, event_id: str):
+        """Undo a claim before the event is acked so Stripe's retry gets processed"""
+        self.cache.invalidate(event_id)
+        self.repository.release_event(event_id)
+
+    def dead_letter(self, event: Dict, error: str, attempts: int):
+        """Park an acked event whose handler kept failing; the claim stays so redeliveries are still skipped"""
+        self.repository.record_failed_event(event, error, attempts)
+
+    def failed_events(self) -> List[Dict]:
+        return self.repository.list_failed_events()
+
+    def resolve(self, event_id: str):
+        """Drop a dead-lettered event once a replay succeeded"""
+        self.repository.delete_failed_event(event_id)
+
+    def prune(self, older_than_days: int = PRUNE_AFTER_DAYS) -> int:
+        """Forget claims older than Stripe's retry window"""
+        return self.repository.prune_events(older_than_days)
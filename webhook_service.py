@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Stripe Webhook Service for Spark Tracker
+Minimal ASGI app: verifies the signature, acks right away and hands the
+event to an asyncio worker queue that runs SparkPaymentProcessor handlers
+Built by SavvyTech Automations
+
+Run:  uvicorn webhook_service:create_app --factory --port 8080
+Demo: python webhook_service.py   (in-process burst of self-signed events)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from payment_logging import log_event
+from stripe_integration import SparkPaymentProcessor, signed_test_event
+from trip_store import ConnectionPool, SqlTripRepository
+from entitlements import EntitlementStore
+from webhook_idempotency import EventIdempotency
+
+WEBHOOK_PATH = "/webhook"
+QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+RETRY_ATTEMPTS = int(os.getenv("WEBHOOK_RETRY_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = 1.0  # Seconds, doubled per attempt
+RETRY_MAX_DELAY = 30.0
+PRUNE_INTERVAL = 6 * 3600  # Seconds between processed_events cleanups
+
+
+class WebhookService:
+    """ASGI callable; POST /webhook enqueues, GET /health reports queue stats"""
+
+    def __init__(self, processor: Optional[SparkPaymentProcessor] = None,
+                 queue_size: int = QUEUE_SIZE, workers: int = WEBHOOK_WORKERS,
+                 retry_attempts: int = RETRY_ATTEMPTS, retry_delay: float = RETRY_BASE_DELAY):
+        self.processor = processor or SparkPaymentProcessor()
+        self.queue_size = queue_size
+        self.worker_count = workers
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.queues: List[asyncio.Queue] = []  # One per worker; a customer always maps to the same one
+        self._workers = []
+        self._pruner: Optional[asyncio.Task] = None
+        self.stats = {'received': 0, 'rejected': 0, 'duplicate': 0, 'shed': 0, 'processed': 0, 'failed': 0,
+                      'retried': 0, 'dead_lettered': 0}
+
+    async def start(self):
+        """Create the queues and worker tasks (runs on ASGI lifespan startup)"""
+        if self.queues:
+            return
+        per_worker = max(1, self.queue_size // self.worker_count)
+        self.queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.worker_count)]
+        self._workers = [asyncio.create_task(self._worker(q)) for q in self.queues]
+        if self.processor.idempotency is not None:
+            self._pruner = asyncio.create_task(self._prune_periodically())
+
+    async def stop(self):
+        """Drain queued events, then stop the workers"""
+        if not self.queues:
+            return
+        for q in self.queues:
+            await q.join()
+        tasks = self._workers + ([self._pruner] if self._pruner else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._pruner = None
+        self.queues = []
+
+    def _queue_for(self, event: Dict) -> asyncio.Queue:
+        """Same customer -> same worker, so one customer's events run in arrival order"""
+        key = (event['data']['object'].get('customer') or event['id']).encode('utf-8')
+        return self.queues[zlib.crc32(key) % len(self.queues)]
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            event = await queue.get()
+            try:
+                ok = await self._process(event)
+                self.stats['processed' if ok else 'failed'] += 1
+            finally:
+                queue.task_done()
+
+    async def _process(self, event: Dict) -> bool:
+        """
+        Run an acked event's handler, retrying with backoff
+
+        Stripe won't redeliver an event it got a 200 for, so the claim is kept
+        and an event that still fails is dead-lettered for reconcile.py to replay.
+        Retrying inline holds back the customer's later events, keeping their order.
+        """
+        error = None
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                # Handlers are sync (and will touch storage), keep them off the event loop
+                result = await asyncio.to_thread(self.processor.dispatch_event, event)
+                if result.get('success'):
+                    return True
+                error = result.get('error', 'Handler failed')
+            except Exception as e:
+                error = repr(e)
+                self.processor.logger.exception('webhook_handler_error', extra={'fields': {
+                    'event_id': event.get('id'), 'event_type': event.get('type'), 'attempt': attempt}})
+            if attempt < self.retry_attempts:
+                self.stats['retried'] += 1
+                await asyncio.sleep(min(self.retry_delay * 2 ** (attempt - 1), RETRY_MAX_DELAY))
+
+        await self._dead_letter(event, error, self.retry_attempts)
+        return False
+
+    async def _dead_letter(self, event: Dict, error: Optional[str], attempts: int):
+        self.stats['dead_lettered'] += 1
+        log_event(self.processor.logger, 'webhook_dead_lettered', logging.ERROR,
+                  event_id=event['id'], event_type=event['type'], error=error, attempts=attempts)
+        if self.processor.idempotency is not None:
+            await asyncio.to_thread(self.processor.idempotency.dead_letter, event, error, attempts)
+
+    async def _prune_periodically(self):
+        while True:
+            try:
+                pruned = await asyncio.to_thread(self.processor.idempotency.prune)
+                log_event(self.processor.logger, 'processed_events_pruned', pruned=pruned)
+            except Exception:
+                self.processor.logger.exception('processed_events_prune_error')
+            await asyncio.sleep(PRUNE_INTERVAL)
+
+    async def receive_event(self, payload: bytes, sig_header: str) -> Tuple[int, Dict]:
+        """
+        Verify and enqueue one delivery
+
+        Returns:
+            (HTTP status, JSON body); Stripe retries anything that isn't 2xx
+        """
+        verified = self.processor.verify_webhook_event(payload, sig_header)
+        if not verified['success']:
+            self.stats['rejected'] += 1
+            return 400, {'error': verified['error']}
+
+        event = verified['event']
+        if await self._is_duplicate(event):
+            # Ack so Stripe stops retrying, but don't process again
+            self.stats['duplicate'] += 1
+            log_event(self.processor.logger, 'webhook_duplicate', event_id=event['id'], event_type=event['type'])
+            return 200, {'received': True, 'duplicate': True}
+
+        await self.start()
+        try:
+            self._queue_for(event).put_nowait(event)
+        except asyncio.QueueFull:
+            # Shed load; Stripe redelivers with backoff
+            self.stats['shed'] += 1
+            await self._release(event)
+            return 503, {'error': 'Busy, retry later'}
+
+        self.stats['received'] += 1
+        return 200, {'received': True}
+
+    async def _is_duplicate(self, event: Dict) -> bool:
+        idempotency = self.processor.idempotency
+        if idempotency is None:
+            return False
+        if idempotency.seen(event['id']):
+            return True  # Hot retry, rejected without touching the database
+        return not await asyncio.to_thread(idempotency.claim, event)
+
+    async def _release(self, event: Dict):
+        if self.processor.idempotency is not None:
+            await asyncio.to_thread(self.processor.idempotency.release, event['id'])
+
+    def health(self) -> Dict:
+        return dict(self.stats, queued=sum(q.qsize() for q in self.queues))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        method, path = scope['method'], scope['path']
+        if method == 'POST' and path == WEBHOOK_PATH:
+            headers = dict(scope.get('headers') or [])
+            sig_header = headers.get(b'stripe-signature', b'').decode('latin-1')
+            status, body = await self.receive_event(await self._read_body(receive), sig_header)
+        elif method == 'GET' and path == '/health':
+            status, body = 200, self.health()
+        else:
+            status, body = 404, {'error': 'Not found'}
+
+        await self._send_json(send, status, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    async def _send_json(send, status: int, body: Dict):
+        data = json.dumps(body).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]
+        })
+        await send({'type': 'http.response.body', 'body': data})
+
+
+def build_processor(database_url: Optional[str] = None) -> SparkPaymentProcessor:
+    """Processor wired to the shared store's idempotency and entitlement tables"""
+    pool = ConnectionPool(database_url) if database_url else ConnectionPool()
+    repository = SqlTripRepository(pool)
+    return SparkPaymentProcessor(idempotency=EventIdempotency(repository),
+                                 entitlements=EntitlementStore(repository))
+
+
+def create_app() -> WebhookService:
+    """ASGI app factory (uvicorn --factory), so importing this module opens no database"""
+    return WebhookService(build_processor())
+
+
+async def _post(service: WebhookService, payload: bytes, sig_header: str) -> int:
+    """Drive one POST through the ASGI app without a server"""
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': 'POST', 'path': WEBHOOK_PATH,
+             'headers': [(b'stripe-signature', sig_header.encode())]}
+    await service(scope, receive, send)
+    return sent[0]['status']
+
+
+async def demo(events: int = 500):
+    """Fire a burst of self-signed events at an in-process service"""
+    import tempfile
+
+    service = WebhookService(build_processor(f"sqlite:///{tempfile.mkdtemp()}/webhook_demo.db"))
+    samples = [
+        ('checkout.session.completed', {'customer_email': 'test@example.com', 'customer': 'cus_test', 'subscription': 'sub_test'}),
+        ('customer.subscription.updated', {'customer': 'cus_test', 'status': 'active'}),
+        ('invoice.payment_failed', {'customer': 'cus_test', 'customer_email': 'test@example.com'}),
+    ]
+    deliveries = [signed_test_event(*samples[i % len(samples)]) for i in range(events)]
+    deliveries += deliveries[:50]  # Stripe-style redeliveries
+    deliveries.append((deliveries[0][0], "t=0,v1=bad"))  # One forged delivery
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*[_post(service, payload, sig) for payload, sig in deliveries])
+    acked = time.perf_counter() - start
+    await service.stop()
+    done = time.perf_counter() - start
+
+    print(f"🧪 {len(deliveries)} deliveries acked in {acked * 1000:.1f} ms, processed in {done * 1000:.1f} ms")
+    print(f"   Statuses: {{200: {statuses.count(200)}, 400: {statuses.count(400)}, 503: {statuses.count(503)}}}")
+    print(f"   Stats: {service.health()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(demo())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Gas Price x Vehicle What-If for Spark Tracker
+Re-prices a driver's real trip history across a grid of gas prices
+and every vehicle configuration in one broadcasted NumPy expression
+Built by SavvyTech Automations
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+def vehicle_grid(vehicle_mpg: Dict[Tuple[str, str, str], float]) -> Tuple[List[str], np.ndarray]:
+    """Column labels and MPG vector for every configured vehicle"""
+    labels = []
+    for vehicle, engine, fuel in vehicle_mpg:
+        labels.append(vehicle if engine == vehicle else f"{vehicle} {engine}")
+    return labels, np.array(list(vehicle_mpg.values()), dtype=float)
+
+
+def what_if_net(
+    pay: Sequence[float],
+    miles: Sequence[float],
+    gas_prices: np.ndarray,
+    mpg: np.ndarray,
+    wear_per_mile: float = 0.10
+) -> np.ndarray:
+    """
+    Total net earnings of the trip history for every (gas price, vehicle) pair
+
+    Args:
+        pay: Gross pay per trip
+        miles: One-way miles per trip (doubled for round trip, like calculate_net_earnings)
+        gas_prices: Gas prices to evaluate, shape (G,)
+        mpg: MPG per vehicle configuration, shape (V,)
+        wear_per_mile: Wear & tear cost per round-trip mile
+
+    Returns:
+        Array of shape (G, V) with total net earnings
+    """
+    pay = np.asarray(pay, dtype=float)
+    round_trip = np.asarray(miles, dtype=float) * 2
+
+    # Cost is linear in miles, so the per-trip sum collapses before broadcasting
+    cost_per_mile = gas_prices[:, None] / mpg[None, :] + wear_per_mile
+    return pay.sum() - round_trip.sum() * cost_per_mile
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Write-Behind Trip Queue for Spark Tracker
+Save Trip returns as soon as the trip is in an in-memory journal;
+a background worker group-commits batches to the repository with retries
+Built by SavvyTech Automations
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+from trip_record import fingerprint
+from trip_store import TripRepository
+
+
+class WriteBehindQueue:
+    """In-memory journal flushed to a TripRepository by one background thread"""
+
+    def __init__(self, repository: TripRepository, batch_size: int = 200,
+                 flush_interval: float = 0.25, max_retries: int = 5):
+        self.repository = repository
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # Wait this long to gather a group commit
+        self.max_retries = max_retries
+
+        self._journal: deque = deque()
+        self._pending: Dict[str, List[Dict]] = {}  # user_id -> saved but not yet durable
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.last_error = None
+
+        self._worker = threading.Thread(target=self._run, name="trip-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def enqueue(self, user_id: str, trip: Dict):
+        """Journal a trip and return immediately"""
+        with self._cond:
+            self._journal.append((user_id, trip))
+            self._pending.setdefault(user_id, []).append(trip)
+            self._cond.notify()
+
+    def pending(self, user_id: str) -> List[Dict]:
+        """Trips this user saved that haven't reached storage yet"""
+        with self._cond:
+            return list(self._pending.get(user_id, []))
+
+    def read_trips(self, user_id: str) -> List[Dict]:
+        """Stored trips plus still-journaled ones (read-your-writes)"""
+        with self._cond:
+            # Snapshot pending first; a batch that commits meanwhile is then seen via the store
+            pending = list(self._pending.get(user_id, []))
+        stored = self.repository.list_trips(user_id)
+        stored_fps = {fingerprint(t) for t in stored}
+        return stored + [t for t in pending if fingerprint(t) not in stored_fps]
+
+    def _take_batch(self) -> List[Tuple[str, Dict]]:
+        with self._cond:
+            while not self._journal and not self._stopped:
+                self._cond.wait()
+            # Give concurrent saves a moment to join this commit
+            deadline = time.monotonic() + self.flush_interval
+            while not self._stopped and len(self._journal) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._journal and len(batch) < self.batch_size:
+                batch.append(self._journal.popleft())
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                if self._stopped:
+                    return
+                continue
+            if self._write_with_retries(batch):
+                self._settle(batch)
+            else:
+                # Storage still down: put the batch back in order and try again later
+                with self._cond:
+                    self._journal.extendleft(reversed(batch))
+                time.sleep(self.flush_interval * 4)
+                if self._stopped:
+                    return
+
+    def _write_with_retries(self, batch: List[Tuple[str, Dict]]) -> bool:
+        for attempt in range(self.max_retries):
+            try:
+                self.repository.write_batch(batch)
+                self.last_error = None
+                return True
+            except Exception as e:
+                self.last_error = e
+                time.sleep(min(0.05 * 2 ** attempt, 2.0))  # Exponential backoff
+        return False
+
+    def _settle(self, batch: List[Tuple[str, Dict]]):
+        """Drop durable trips from the read-your-writes overlay"""
+        with self._cond:
+            for user_id, trip in batch:
+                pending = self._pending.get(user_id, [])
+                for i, candidate in enumerate(pending):
+                    if candidate is trip:
+                        del pending[i]
+                        break
+                if not pending:
+                    self._pending.pop(user_id, None)
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything journaled so far is durable"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()